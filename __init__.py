@@ -21,10 +21,12 @@ def create_app():
     from src.api.movies import movies_bp
     from src.api.series import series_bp
     from src.api.progress import progress_bp
+    from src.api.trending import trending_bp
     
     app.register_blueprint(movies_bp, url_prefix='/api')
     app.register_blueprint(series_bp, url_prefix='/api')
     app.register_blueprint(progress_bp, url_prefix='/api')
+    app.register_blueprint(trending_bp, url_prefix='/api')
     
     # Crear tablas en la base de datos
     with app.app_context():
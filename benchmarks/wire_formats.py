@@ -0,0 +1,96 @@
+"""Compara tamano y CPU de los formatos de respuesta frente a ``jsonify``.
+
+Uso::
+
+    python benchmarks/wire_formats.py [cantidad_de_peliculas]
+
+Genera un listado sintetico con la forma de ``Movie.to_dict`` y mide cada
+combinacion formato/compresion disponible con las mismas funciones que usa la
+app (``src.negotiation``) bajo ``ProductionConfig``. La linea base es lo que
+envia ``jsonify`` en produccion (JSON compacto). ``msgpack`` y ``brotli`` se
+omiten si no estan instalados.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flask import jsonify  # noqa: E402
+
+from src import create_app  # noqa: E402
+from src.config import ProductionConfig  # noqa: E402
+from src.negotiation import JSON_MIMETYPE, brotli, compress_body, encode_body, msgpack  # noqa: E402
+
+GENRES = ["Drama", "Comedy", "Sci-Fi", "Thriller", "Animation", "Documentary", "Horror"]
+DIRECTORS = [f"Director {index}" for index in range(200)]
+
+
+def build_payload(count: int) -> list[dict]:
+    rng = random.Random(42)
+    return [
+        {
+            "id": movie_id,
+            "title": f"Movie {movie_id} {rng.choice(['Returns', 'Rising', 'Origins', 'Forever'])}",
+            "description": " ".join(rng.choice(["a", "film", "about", "the", "city", "night", "love", "war"])
+                                    for _ in range(rng.randint(8, 30))),
+            "release_year": rng.randint(1950, 2025),
+            "duration": rng.randint(70, 190),
+            "genre": rng.choice(GENRES),
+            "director": rng.choice(DIRECTORS),
+            "created_at": f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T12:00:00",
+        }
+        for movie_id in range(1, count + 1)
+    ]
+
+
+def measure(label: str, encode, repeat: int) -> tuple[str, int, float]:
+    size = len(encode())
+    seconds = min(timeit.repeat(encode, number=1, repeat=repeat))
+    return label, size, seconds * 1000
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    payload = build_payload(count)
+    repeat = 20
+    app = create_app(ProductionConfig)
+
+    with app.test_request_context():
+        config = app.config
+        json_body = jsonify(payload).get_data()
+        # jsonify solo agrega el salto de linea final
+        assert encode_body(payload, JSON_MIMETYPE) + b"\n" == json_body, "encode_body no coincide con jsonify"
+
+        cases = [
+            ("jsonify (baseline)", lambda: jsonify(payload).get_data()),
+            (f"json + gzip-{config['GZIP_LEVEL']}",
+             lambda: compress_body(encode_body(payload, JSON_MIMETYPE), "gzip")),
+        ]
+        if brotli is not None:
+            cases.append((f"json + br-{config['BROTLI_QUALITY']}",
+                          lambda: compress_body(encode_body(payload, JSON_MIMETYPE), "br")))
+        if msgpack is not None:
+            msgpack_type = "application/msgpack"
+            cases.append(("msgpack", lambda: encode_body(payload, msgpack_type)))
+            cases.append((f"msgpack + gzip-{config['GZIP_LEVEL']}",
+                          lambda: compress_body(encode_body(payload, msgpack_type), "gzip")))
+            if brotli is not None:
+                cases.append((f"msgpack + br-{config['BROTLI_QUALITY']}",
+                              lambda: compress_body(encode_body(payload, msgpack_type), "br")))
+
+        cache = {("movies", 1, JSON_MIMETYPE, "gzip"): compress_body(json_body, "gzip")}
+        cases.append(("cache hit (precomprimido)", lambda: cache[("movies", 1, JSON_MIMETYPE, "gzip")]))
+
+        print(f"{count} peliculas; mejor de {repeat} corridas")
+        print(f"{'formato':<28}{'bytes':>12}{'% json':>9}{'ms':>10}")
+        for label, size, millis in (measure(label, encode, repeat) for label, encode in cases):
+            print(f"{label:<28}{size:>12}{size / len(json_body):>9.1%}{millis:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ def create_app(config_object: type[DevelopmentConfig] = DevelopmentConfig) -> Fl
 
     register_extensions(app)
     register_blueprints(app)
+    register_commands(app)
     CORS(app)
 
     return app
@@ -20,8 +21,12 @@ def create_app(config_object: type[DevelopmentConfig] = DevelopmentConfig) -> Fl
 
 def register_extensions(app: Flask) -> None:
     """Inicializa extensiones de terceros."""
+    from . import sharding, trending
+
     db.init_app(app)
     migrate.init_app(app, db)
+    trending.init_app(app)
+    sharding.init_app(app)
 
 
 def register_blueprints(app: Flask) -> None:
@@ -29,3 +34,10 @@ def register_blueprints(app: Flask) -> None:
     from .api import register_api_blueprints
 
     register_api_blueprints(app)
+
+
+def register_commands(app: Flask) -> None:
+    """Registra los comandos CLI del proyecto."""
+    from .commands import register_commands as register_cli_commands
+
+    register_cli_commands(app)
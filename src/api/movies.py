@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from src import catalog_snapshot
+from src.api.utils import build_multi_get_payload, parse_ids
+from src.negotiation import negotiated_response
 from src.database import db
 from src.models.movie import Movie
+from src.models.similar_title import SimilarTitle
+from src.models.similar_title_change import SimilarTitleChange
 
 movies_bp = Blueprint('movies', __name__)
 
@@ -18,6 +23,12 @@ class MovieService:
             return None
         return movie
     
+    @staticmethod
+    def get_movies_by_ids(movie_ids):
+        """Obtener varias películas con una sola consulta IN (dict id -> película)"""
+        movies = Movie.query.filter(Movie.id.in_(set(movie_ids))).all()
+        return {movie.id: movie for movie in movies}
+    
     @staticmethod
     def create_movie(movie_data):
         """Crear nueva película"""
@@ -37,7 +48,10 @@ class MovieService:
         )
         
         db.session.add(movie)
+        db.session.flush()
+        SimilarTitleChange.mark('movie', movie.id)
         db.session.commit()
+        catalog_snapshot.refresh()
         return movie
     
     @staticmethod
@@ -53,7 +67,12 @@ class MovieService:
             if field in movie_data:
                 setattr(movie, field, movie_data[field])
         
+        # Título, género o director cambian los vecinos de esta película y de las que la listan
+        if any(field in movie_data for field in ('title', 'genre', 'director')):
+            SimilarTitleChange.mark('movie', movie.id)
+        
         db.session.commit()
+        catalog_snapshot.refresh()
         return movie
     
     @staticmethod
@@ -64,23 +83,55 @@ class MovieService:
             return False
         
         db.session.delete(movie)
+        SimilarTitleChange.mark('movie', movie_id)
         db.session.commit()
+        catalog_snapshot.refresh()
         return True
 
 # Endpoints
 @movies_bp.route('/movies', methods=['GET'])
 def get_movies():
-    """Obtener todas las películas"""
+    """Obtener todas las películas, o solo las indicadas con ?ids=1,2,3"""
+    if 'ids' in request.args:
+        return get_movies_by_ids()
+    
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        return negotiated_response(snapshot.movie_list, cache_key=('movies', snapshot.generation))
+    
     movies = MovieService.get_all_movies()
-    return jsonify([movie.to_dict() for movie in movies])
+    return negotiated_response([movie.to_dict() for movie in movies])
+
+def get_movies_by_ids():
+    """Obtener varias películas en el orden pedido (null para ids inexistentes)"""
+    try:
+        movie_ids = parse_ids(request.args['ids'], current_app.config.get('MULTI_GET_MAX_IDS', 100))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        records = {movie_id: snapshot.movie(movie_id) for movie_id in movie_ids}
+    else:
+        movies = MovieService.get_movies_by_ids(movie_ids)
+        records = {movie_id: movie.to_dict() for movie_id, movie in movies.items()}
+    
+    return negotiated_response(build_multi_get_payload(movie_ids, records))
 
 @movies_bp.route('/movies/<int:movie_id>', methods=['GET'])
 def get_movie(movie_id):
     """Obtener película por ID"""
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        body = snapshot.movie(movie_id)
+        if body is None:
+            return jsonify({'error': 'Movie not found'}), 404
+        return negotiated_response(body)
+    
     movie = MovieService.get_movie_by_id(movie_id)
     if not movie:
         return jsonify({'error': 'Movie not found'}), 404
-    return jsonify(movie.to_dict())
+    return negotiated_response(movie.to_dict())
 
 @movies_bp.route('/movies', methods=['POST'])
 def create_movie():
@@ -117,4 +168,17 @@ def delete_movie(movie_id):
     if not success:
         return jsonify({'error': 'Movie not found'}), 404
     
-    return '', 204
\ No newline at end of file
+    return '', 204
+
+@movies_bp.route('/movies/<int:movie_id>/similar', methods=['GET'])
+def get_similar_movies(movie_id):
+    """Obtener títulos similares precalculados"""
+    limit = request.args.get('limit', type=int)
+    neighbors = SimilarTitle.get_neighbors('movie', movie_id, limit)
+    if neighbors is None:
+        # Sin fila precalculada: distinguir película inexistente de aún no procesada
+        if not MovieService.get_movie_by_id(movie_id):
+            return jsonify({'error': 'Movie not found'}), 404
+        neighbors = []
+    
+    return negotiated_response(neighbors)
\ No newline at end of file
@@ -1,7 +1,18 @@
-from flask import Blueprint, request, jsonify
+import csv
+import hmac
+import io
+import json
+import zlib
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import and_, case, func, select, update
+from src import sharding, trending
 from src.database import db
+from src.negotiation import negotiated_response
 from src.models.watch_entry import WatchEntry
+from src.models.watch_entry_archive import WatchEntryArchive
 from src.models.movie import Movie
+from src.models.similar_title_change import SimilarTitleChange
 from src.models.series import Series
 from src.models.user import User
 
@@ -21,16 +32,71 @@ def get_user_id():
     except (ValueError, TypeError):
         return None
 
+def is_admin_request():
+    """Valida el header X-Admin-Token contra ADMIN_TOKEN de la configuración"""
+    expected = current_app.config.get('ADMIN_TOKEN')
+    token = request.headers.get('X-Admin-Token')
+    if not expected or not token:
+        return False
+    # Comparación en tiempo constante: no filtra cuántos caracteres coinciden
+    return hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+def get_expected_version():
+    """Versión esperada según el header If-Match ("3", W/"3"); ValueError si es inválido
+    
+    If-Match: * coincide con cualquier versión existente (RFC 9110): sin control de versión.
+    """
+    if_match = request.headers.get('If-Match')
+    if not if_match:
+        return None
+    tag = if_match.strip()
+    if tag == '*':
+        return None
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    return int(tag.strip('"'))
+
+def parse_version(value):
+    """Versión enviada en el body (3 o "3"); ValueError si no es un entero"""
+    if isinstance(value, (bool, float)):
+        raise ValueError(value)
+    try:
+        return int(value)
+    except TypeError as error:
+        raise ValueError(value) from error
+
+def parse_flag(value):
+    """Interpreta flags de query string o JSON ("1", "true", True)"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+class VersionConflict(Exception):
+    """La entrada cambió desde la versión que envió el cliente"""
+    
+    def __init__(self, current):
+        super().__init__('Watch entry version mismatch')
+        self.current = current
+
 class ProgressService:
     @staticmethod
-    def get_watchlist(user_id):
-        """Obtener la watchlist completa del usuario"""
-        return WatchEntry.query.filter_by(user_id=user_id).all()
+    def get_watchlist(user_id, include_history=False):
+        """Obtener la watchlist del usuario (por defecto solo la tabla activa)"""
+        session = sharding.session_for_user(user_id)
+        entries = session.query(WatchEntry).filter_by(user_id=user_id).all()
+        if include_history:
+            entries += session.query(WatchEntryArchive).filter_by(user_id=user_id).all()
+            entries.sort(key=lambda entry: entry.id)
+        return entries
     
     @staticmethod
     def get_watch_entry(entry_id, user_id):
-        """Obtener una entrada específica de la watchlist"""
-        return WatchEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+        """Obtener una entrada específica de la watchlist (activa o archivada)"""
+        session = sharding.session_for_user(user_id)
+        watch_entry = session.query(WatchEntry).filter_by(id=entry_id, user_id=user_id).first()
+        if watch_entry:
+            return watch_entry
+        return session.query(WatchEntryArchive).filter_by(id=entry_id, user_id=user_id).first()
     
     @staticmethod
     def add_to_watchlist(user_id, content_data):
@@ -59,11 +125,18 @@ class ProgressService:
             # Para series, la duración total es el número total de episodios
             total_duration = sum(season.episode_count for season in content.seasons)
         
-        # Verificar si ya existe en la watchlist
-        existing_entry = WatchEntry.query.filter_by(
+        # Las entradas viven en el shard del usuario (se asigna en su primera escritura)
+        session = sharding.ensure_user_shard(user_id)
+        
+        # Verificar si ya existe en la watchlist (o en el historial)
+        existing_entry = session.query(WatchEntry).filter_by(
             user_id=user_id, 
             content_type=content_type, 
             content_id=content_id
+        ).first() or session.query(WatchEntryArchive).filter_by(
+            user_id=user_id,
+            content_type=content_type,
+            content_id=content_id
         ).first()
         
         if existing_entry:
@@ -71,6 +144,7 @@ class ProgressService:
         
         # Crear nueva entrada
         watch_entry = WatchEntry(
+            id=sharding.next_entry_id(),
             user_id=user_id,
             content_type=content_type,
             content_id=content_id,
@@ -79,50 +153,298 @@ class ProgressService:
             total_duration=total_duration
         )
         
-        db.session.add(watch_entry)
-        db.session.commit()
+        session.add(watch_entry)
+        # Cambia la co-ocurrencia: marca para el refresco incremental de similares
+        SimilarTitleChange.mark(content_type, content_id, user_id=user_id)
+        session.commit()
+        if session is not db.session:
+            db.session.commit()
+        trending.record('added', content_type, content_id)
         return watch_entry
     
     @staticmethod
-    def update_progress(entry_id, user_id, progress_data):
-        """Actualizar el progreso de visualización"""
-        watch_entry = WatchEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+    def update_progress(entry_id, user_id, progress_data, expected_version=None, monotonic=None):
+        """Actualizar el progreso con un único UPDATE ... RETURNING condicional
+        
+        expected_version (If-Match o "version" en el body) rechaza escrituras basadas en
+        una versión vieja con VersionConflict; en modo monotónico se ignoran retrocesos
+        de progreso (p. ej. un dispositivo atrasado). Solo se vuelve a leer la fila
+        cuando el UPDATE no afecta ninguna.
+        """
+        if expected_version is None:
+            expected_version = progress_data.get('version')
+        
+        current_progress = progress_data.get('current_progress')
+        if current_progress is None:
+            # Sin cambios que aplicar, pero una versión vieja sigue siendo un conflicto
+            watch_entry = ProgressService.get_watch_entry(entry_id, user_id)
+            if watch_entry and expected_version is not None and watch_entry.version != expected_version:
+                raise VersionConflict(watch_entry)
+            return watch_entry
+        
+        # Validar que el progreso no sea negativo
+        if current_progress < 0:
+            return None
+        
+        if monotonic is None:
+            monotonic = parse_flag(progress_data.get(
+                'monotonic', current_app.config.get('PROGRESS_MONOTONIC_DEFAULT', False)
+            ))
+        
+        # Misma regla que WatchEntry.update_progress, calculada en SQL
+        if current_progress == 0:
+            new_status, new_progress = 'pending', 0
+        else:
+            reaches_end = WatchEntry.total_duration <= current_progress
+            new_status = case((reaches_end, 'completed'), else_='watching')
+            new_progress = case((reaches_end, WatchEntry.total_duration), else_=current_progress)
+        
+        stored_progress = func.coalesce(WatchEntry.current_progress, 0)
+        conditions = [
+            WatchEntry.id == entry_id,
+            WatchEntry.user_id == user_id,
+            # Sin escrituras que no cambian nada: así un 'completed' devuelto es siempre una transición
+            ~and_(WatchEntry.status == new_status, stored_progress == new_progress)
+        ]
+        if expected_version is not None:
+            conditions.append(WatchEntry.version == expected_version)
+        if monotonic:
+            conditions.append(stored_progress <= current_progress)
+        
+        stmt = update(WatchEntry).where(*conditions).values(
+            current_progress=new_progress,
+            status=new_status,
+            version=WatchEntry.version + 1
+        )
+        session = sharding.session_for_user(user_id)
+        if session.get_bind().dialect.update_returning:
+            watch_entry = session.scalars(stmt.returning(WatchEntry)).first()
+        else:
+            updated = session.execute(stmt).rowcount
+            watch_entry = session.get(WatchEntry, entry_id, populate_existing=True) if updated else None
+        
+        if watch_entry is None:
+            session.rollback()
+            return ProgressService._resolve_skipped_update(
+                entry_id, user_id, current_progress, expected_version, monotonic
+            )
+        
+        # Fuera de la sesión no se expira al hacer commit: se serializa sin otro SELECT
+        session.expunge(watch_entry)
+        session.commit()
+        if watch_entry.status == 'completed':
+            trending.record('completed', watch_entry.content_type, watch_entry.content_id)
+        return watch_entry
+    
+    @staticmethod
+    def _resolve_skipped_update(entry_id, user_id, current_progress, expected_version, monotonic):
+        """Explicar por qué el UPDATE no afectó filas: inexistente, archivada, versión vieja o no-op"""
+        watch_entry = ProgressService.get_watch_entry(entry_id, user_id)
         if not watch_entry:
             return None
+        if expected_version is not None and watch_entry.version != expected_version:
+            raise VersionConflict(watch_entry)
+        if not isinstance(watch_entry, WatchEntryArchive):
+            # Nada que cambiar, o retroceso ignorado en modo monotónico
+            return watch_entry
         
-        current_progress = progress_data.get('current_progress')
-        if current_progress is not None:
-            # Validar que el progreso no sea negativo
-            if current_progress < 0:
-                return None
-            
-            # Usar el método helper para actualizar progreso y estado
-            watch_entry.update_progress(current_progress)
+        if monotonic and current_progress < (watch_entry.current_progress or 0):
+            return watch_entry
+        
+        # Las entradas archivadas son poco frecuentes: se actualizan por el ORM
+        watch_entry.update_progress(current_progress)
         
-        db.session.commit()
+        # Una entrada archivada que deja de estar completada vuelve a la tabla activa
+        if watch_entry.status != 'completed':
+            watch_entry = watch_entry.restore()
+        
+        sharding.session_for_user(user_id).commit()
         return watch_entry
     
     @staticmethod
     def remove_from_watchlist(entry_id, user_id):
-        """Eliminar contenido de la watchlist"""
-        watch_entry = WatchEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+        """Eliminar contenido de la watchlist (activa o archivada)"""
+        watch_entry = ProgressService.get_watch_entry(entry_id, user_id)
         if not watch_entry:
             return False
         
-        db.session.delete(watch_entry)
-        db.session.commit()
+        session = sharding.session_for_user(user_id)
+        session.delete(watch_entry)
+        # Un borrado no deja updated_at: se marca para el refresco incremental de similares
+        SimilarTitleChange.mark(watch_entry.content_type, watch_entry.content_id, user_id=user_id)
+        session.commit()
+        if session is not db.session:
+            db.session.commit()
         return True
 
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = [
+    'id', 'user_id', 'content_type', 'content_id', 'status',
+    'current_progress', 'total_duration', 'percentage_watched',
+    'created_at', 'updated_at'
+]
+
+class ExportService:
+    @staticmethod
+    def iter_rows(user_id=None, include_titles=False, batch_size=None):
+        """Recorrer las entradas (activas y luego el historial) con un cursor del lado del servidor"""
+        if user_id is not None:
+            sessions = [sharding.session_for_user(user_id)]
+        else:
+            sessions = [session for _, session in sharding.iter_sessions()]
+        
+        for session in sessions:
+            for model in (WatchEntry, WatchEntryArchive):
+                yield from ExportService._iter_model_rows(
+                    session, model, user_id, include_titles, batch_size
+                )
+    
+    @staticmethod
+    def _lookup_titles(rows):
+        """Títulos del catálogo (base principal) para un lote: una consulta IN por tipo"""
+        titles = {}
+        for content_type, model in (('movie', Movie), ('series', Series)):
+            ids = {row.content_id for row in rows if row.content_type == content_type}
+            if ids:
+                for content_id, title in db.session.execute(select(model.id, model.title).where(model.id.in_(ids))):
+                    titles[(content_type, content_id)] = title
+        return titles
+    
+    @staticmethod
+    def _iter_model_rows(session, model, user_id, include_titles, batch_size):
+        """Recorrer una tabla de entradas con memoria constante"""
+        if batch_size is None:
+            batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        
+        # Se seleccionan columnas y no entidades: no se llena el identity map de la sesión
+        stmt = select(
+            model.id, model.user_id, model.content_type,
+            model.content_id, model.status, model.current_progress,
+            model.total_duration, model.created_at, model.updated_at
+        )
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        stmt = stmt.order_by(model.id).execution_options(
+            stream_results=True, yield_per=batch_size
+        )
+        
+        result = session.execute(stmt)
+        try:
+            for rows in result.partitions():
+                # El catálogo puede estar en otra base (shards): títulos por lote, no con JOIN
+                titles = ExportService._lookup_titles(rows) if include_titles else {}
+                for row in rows:
+                    data = {
+                        'id': row.id,
+                        'user_id': row.user_id,
+                        'content_type': row.content_type,
+                        'content_id': row.content_id,
+                        'status': row.status,
+                        'current_progress': row.current_progress,
+                        'total_duration': row.total_duration,
+                        'percentage_watched': WatchEntry.compute_percentage(
+                            row.current_progress, row.total_duration
+                        ),
+                        'created_at': row.created_at.isoformat() if row.created_at else None,
+                        'updated_at': row.updated_at.isoformat() if row.updated_at else None
+                    }
+                    if include_titles:
+                        data['title'] = titles.get((row.content_type, row.content_id))
+                    yield data
+        finally:
+            # Liberar el cursor y la conexión apenas termina (o se corta) la descarga
+            result.close()
+            if session is db.session:
+                db.session.remove()
+            else:
+                session.close()
+    
+    @staticmethod
+    def encode_csv(rows, include_titles=False, rows_per_chunk=500):
+        """Serializar filas a CSV agrupándolas en chunks"""
+        fieldnames = EXPORT_COLUMNS + (['title'] if include_titles else [])
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        pending = 0
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= rows_per_chunk:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    
+    @staticmethod
+    def encode_ndjson(rows, rows_per_chunk=500):
+        """Serializar filas a NDJSON (un objeto JSON por línea)"""
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(row, ensure_ascii=False))
+            if len(lines) >= rows_per_chunk:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines = []
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+    
+    @staticmethod
+    def gzip_chunks(chunks):
+        """Comprimir los chunks al vuelo con gzip"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+def wants_gzip():
+    """Indica si el cliente pidió compresión gzip para la exportación"""
+    compress = request.args.get('compress')
+    if compress is not None:
+        return compress == 'gzip'
+    # Respeta calidades (gzip;q=0) y comodines igual que src/negotiation.py
+    return request.accept_encodings.best_match(['gzip']) == 'gzip'
+
+def build_export_response(user_id=None):
+    """Construir la respuesta en streaming de la exportación"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format, expected one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    include_titles = request.args.get('include_titles', 'false').lower() in ('1', 'true', 'yes')
+    rows = ExportService.iter_rows(user_id=user_id, include_titles=include_titles)
+    if export_format == 'csv':
+        chunks = ExportService.encode_csv(rows, include_titles=include_titles)
+        mimetype = 'text/csv'
+    else:
+        chunks = ExportService.encode_ndjson(rows)
+        mimetype = 'application/x-ndjson'
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename=watchlist.{export_format}',
+        'Vary': 'Accept-Encoding'
+    }
+    if wants_gzip():
+        chunks = ExportService.gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    # Sin Content-Length el servidor WSGI responde con Transfer-Encoding: chunked
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
 # Endpoints
 @progress_bp.route('/watchlist', methods=['GET'])
 def get_watchlist():
-    """Obtener la watchlist del usuario"""
+    """Obtener la watchlist del usuario (?include=history suma las entradas archivadas)"""
     user_id = get_user_id()
     if not user_id:
         return jsonify({'error': 'Valid X-User-Id header is required'}), 401
     
-    watchlist = ProgressService.get_watchlist(user_id)
-    return jsonify([entry.to_dict() for entry in watchlist])
+    include_history = 'history' in request.args.get('include', '').split(',')
+    watchlist = ProgressService.get_watchlist(user_id, include_history=include_history)
+    return negotiated_response([entry.to_dict() for entry in watchlist])
 
 @progress_bp.route('/watchlist', methods=['POST'])
 def add_to_watchlist():
@@ -152,11 +474,39 @@ def update_progress(entry_id):
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    watch_entry = ProgressService.update_progress(entry_id, user_id, data)
+    try:
+        expected_version = get_expected_version()
+    except ValueError:
+        return jsonify({'error': 'Invalid If-Match header'}), 400
+    
+    if expected_version is None and data.get('version') is not None:
+        try:
+            expected_version = parse_version(data['version'])
+        except ValueError:
+            return jsonify({'error': 'version must be an integer'}), 400
+    
+    monotonic = request.args.get('monotonic')
+    try:
+        watch_entry = ProgressService.update_progress(
+            entry_id, user_id, data,
+            expected_version=expected_version,
+            monotonic=parse_flag(monotonic) if monotonic is not None else None
+        )
+    except VersionConflict as conflict:
+        response = jsonify({
+            'error': 'Watch entry was modified by another request',
+            'current': conflict.current.to_dict()
+        })
+        response.status_code = 412
+        response.set_etag(str(conflict.current.version))
+        return response
+    
     if not watch_entry:
         return jsonify({'error': 'Watch entry not found or invalid progress value'}), 404
     
-    return jsonify(watch_entry.to_dict())
+    response = jsonify(watch_entry.to_dict())
+    response.set_etag(str(watch_entry.version))
+    return response
 
 @progress_bp.route('/watchlist/<int:entry_id>', methods=['DELETE'])
 def remove_from_watchlist(entry_id):
@@ -182,4 +532,23 @@ def get_watch_entry(entry_id):
     if not watch_entry:
         return jsonify({'error': 'Watch entry not found'}), 404
     
-    return jsonify(watch_entry.to_dict())
\ No newline at end of file
+    response = negotiated_response(watch_entry.to_dict())
+    response.set_etag(str(watch_entry.version))
+    return response
+
+@progress_bp.route('/watchlist/export', methods=['GET'])
+def export_watchlist():
+    """Exportar la watchlist del usuario en CSV o NDJSON (streaming)"""
+    user_id = get_user_id()
+    if not user_id:
+        return jsonify({'error': 'Valid X-User-Id header is required'}), 401
+    
+    return build_export_response(user_id=user_id)
+
+@progress_bp.route('/admin/watchlist/export', methods=['GET'])
+def export_all_watchlists():
+    """Exportar las watchlists de todos los usuarios (solo administradores)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Valid X-Admin-Token header is required'}), 403
+    
+    return build_export_response()
\ No newline at end of file
@@ -1,7 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy.orm import selectinload
+from src import catalog_snapshot
+from src.api.utils import build_multi_get_payload, parse_ids
+from src.negotiation import negotiated_response
 from src.database import db
 from src.models.series import Series
 from src.models.seasons import Season
+from src.models.similar_title import SimilarTitle
+from src.models.similar_title_change import SimilarTitleChange
 
 series_bp = Blueprint('series', __name__)
 
@@ -19,6 +25,20 @@ class SeriesService:
             return None
         return series
     
+    @staticmethod
+    def get_series_by_ids(series_ids):
+        """Obtener varias series con una consulta IN y sus temporadas precargadas (dict id -> datos)"""
+        series_list = Series.query.options(selectinload(Series.seasons)).filter(
+            Series.id.in_(set(series_ids))
+        ).all()
+        
+        result = {}
+        for series in series_list:
+            series_data = series.to_dict()
+            series_data['seasons'] = [season.to_dict() for season in series.seasons]
+            result[series.id] = series_data
+        return result
+    
     @staticmethod
     def create_series(series_data):
         """Crear nueva serie"""
@@ -36,7 +56,10 @@ class SeriesService:
         )
         
         db.session.add(series)
+        db.session.flush()
+        SimilarTitleChange.mark('series', series.id)
         db.session.commit()
+        catalog_snapshot.refresh()
         return series
     
     @staticmethod
@@ -52,7 +75,11 @@ class SeriesService:
             if field in series_data:
                 setattr(series, field, series_data[field])
         
+        if any(field in series_data for field in ('title', 'genre')):
+            SimilarTitleChange.mark('series', series.id)
+        
         db.session.commit()
+        catalog_snapshot.refresh()
         return series
     
     @staticmethod
@@ -63,7 +90,9 @@ class SeriesService:
             return False
         
         db.session.delete(series)
+        SimilarTitleChange.mark('series', series_id)
         db.session.commit()
+        catalog_snapshot.refresh()
         return True
     
     @staticmethod
@@ -104,6 +133,7 @@ class SeasonService:
         
         db.session.add(season)
         db.session.commit()
+        catalog_snapshot.refresh()
         return season
     
     @staticmethod
@@ -120,6 +150,7 @@ class SeasonService:
                 setattr(season, field, season_data[field])
         
         db.session.commit()
+        catalog_snapshot.refresh()
         return season
     
     @staticmethod
@@ -131,22 +162,56 @@ class SeasonService:
         
         db.session.delete(season)
         db.session.commit()
+        catalog_snapshot.refresh()
         return True
 
 # Endpoints de Series
 @series_bp.route('/series', methods=['GET'])
 def get_series():
-    """Obtener todas las series"""
+    """Obtener todas las series, o solo las indicadas con ?ids=1,2,3"""
+    if 'ids' in request.args:
+        return get_series_by_ids()
+    
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        # La generación del snapshot cambia con cada escritura del catálogo
+        return negotiated_response(
+            lambda: [series.to_dict() for series in SeriesService.get_all_series()],
+            cache_key=('series', snapshot.generation)
+        )
+    
     series_list = SeriesService.get_all_series()
-    return jsonify([series.to_dict() for series in series_list])
+    return negotiated_response([series.to_dict() for series in series_list])
+
+def get_series_by_ids():
+    """Obtener varias series con temporadas en el orden pedido (null para ids inexistentes)"""
+    try:
+        series_ids = parse_ids(request.args['ids'], current_app.config.get('MULTI_GET_MAX_IDS', 100))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        records = {series_id: snapshot.series(series_id) for series_id in series_ids}
+    else:
+        records = SeriesService.get_series_by_ids(series_ids)
+    
+    return negotiated_response(build_multi_get_payload(series_ids, records))
 
 @series_bp.route('/series/<int:series_id>', methods=['GET'])
 def get_series_detail(series_id):
     """Obtener serie con temporadas (datos normalizados)"""
+    snapshot = catalog_snapshot.get_snapshot()
+    if snapshot is not None:
+        body = snapshot.series(series_id)
+        if body is None:
+            return jsonify({'error': 'Series not found'}), 404
+        return negotiated_response(body)
+    
     series_data = SeriesService.get_series_with_seasons(series_id)
     if not series_data:
         return jsonify({'error': 'Series not found'}), 404
-    return jsonify(series_data)
+    return negotiated_response(series_data)
 
 @series_bp.route('/series', methods=['POST'])
 def create_series():
@@ -185,6 +250,19 @@ def delete_series(series_id):
     
     return '', 204
 
+@series_bp.route('/series/<int:series_id>/similar', methods=['GET'])
+def get_similar_series(series_id):
+    """Obtener títulos similares precalculados"""
+    limit = request.args.get('limit', type=int)
+    neighbors = SimilarTitle.get_neighbors('series', series_id, limit)
+    if neighbors is None:
+        # Sin fila precalculada: distinguir serie inexistente de aún no procesada
+        if not SeriesService.get_series_by_id(series_id):
+            return jsonify({'error': 'Series not found'}), 404
+        neighbors = []
+    
+    return negotiated_response(neighbors)
+
 # Endpoints de Temporadas
 @series_bp.route('/series/<int:series_id>/seasons', methods=['POST'])
 def create_season(series_id):
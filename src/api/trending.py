@@ -0,0 +1,18 @@
+from flask import Blueprint, request
+from src import trending
+from src.negotiation import negotiated_response
+
+trending_bp = Blueprint('trending', __name__)
+
+# Endpoints
+@trending_bp.route('/trending', methods=['GET'])
+def get_trending():
+    """Títulos más agregados a watchlists en la ventana configurada"""
+    limit = request.args.get('limit', type=int)
+    return negotiated_response(trending.get_top('added', limit))
+
+@trending_bp.route('/trending/completed', methods=['GET'])
+def get_most_completed():
+    """Títulos más completados en la ventana configurada"""
+    limit = request.args.get('limit', type=int)
+    return negotiated_response(trending.get_top('completed', limit))
\ No newline at end of file
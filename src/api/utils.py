@@ -0,0 +1,29 @@
+"""Helpers compartidos por los blueprints."""
+
+import json
+
+
+def parse_ids(raw, max_ids):
+    """Convierte "1,2,3" en [1, 2, 3]; ValueError si hay ids invalidos o demasiados"""
+    try:
+        ids = [int(part) for part in raw.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError('ids must be a comma-separated list of integers') from None
+    if not ids:
+        raise ValueError('ids must contain at least one id')
+    if len(ids) > max_ids:
+        raise ValueError(f'At most {max_ids} ids are allowed per request')
+    return ids
+
+
+def build_multi_get_payload(ids, records):
+    """Resultados en el orden pedido, con null y la lista "missing" para los ids inexistentes
+
+    records mapea id -> dict, o id -> bytes JSON ya serializados (snapshot del catálogo);
+    en ese caso se arma el JSON concatenando bytes, sin deserializar.
+    """
+    missing = [item_id for item_id in ids if records.get(item_id) is None]
+    if any(isinstance(record, (bytes, bytearray)) for record in records.values()):
+        items = b','.join(bytes(records.get(item_id) or b'null') for item_id in ids)
+        return b'{"items":[' + items + b'],"missing":' + json.dumps(missing).encode('utf-8') + b'}'
+    return {'items': [records.get(item_id) for item_id in ids], 'missing': missing}
\ No newline at end of file
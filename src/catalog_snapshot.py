@@ -0,0 +1,267 @@
+"""Snapshot inmutable del catalogo compartido entre workers via ``mmap``.
+
+El archivo contiene, ya serializados a JSON, el listado de peliculas, cada
+pelicula y cada serie con sus temporadas, mas un indice ordenado por id para
+buscar en O(log n) sin deserializar nada. Todos los workers mapean el mismo
+archivo (una sola copia en el page cache) y responden ``GET /movies``,
+``GET /movies/<id>`` y ``GET /series/<id>`` sin tocar la base de datos.
+
+Cada escritura del catalogo genera un archivo nuevo que reemplaza al anterior
+con ``os.replace`` (atomico); los workers detectan el cambio de inodo y
+vuelven a mapear. La regeneracion corre en un hilo aparte, agrupando las
+escrituras de ``CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS``: mientras tanto el
+worker que escribio lee de la base de datos y los demas pueden ver el snapshot
+anterior hasta ``delay + build + CATALOG_SNAPSHOT_CHECK_SECONDS``.
+
+Formato::
+
+    header   MAGIC, FORMAT_VERSION, generacion, lista de peliculas (offset, len),
+             indice de peliculas (offset, cantidad), indice de series (offset, cantidad)
+    datos    "[" pelicula_1 "," pelicula_2 ... "]"  seguido de cada serie
+    indices  entradas (id, offset, len) ordenadas por id
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from flask import Flask, current_app
+from sqlalchemy.orm import selectinload
+
+from src.models.movie import Movie
+from src.models.series import Series
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos, os.replace sigue siendo atomico
+    fcntl = None
+
+MAGIC = b"WLCS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIqQQQQQQ")
+INDEX_ENTRY = struct.Struct("<qQI")
+
+
+class CatalogSnapshot:
+    """Vista de solo lectura sobre un archivo de snapshot mapeado en memoria."""
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as handle:
+            self.inode = os.fstat(handle.fileno()).st_ino
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, version, self.generation,
+            self._list_offset, self._list_length,
+            self._movies_index, self._movies_count,
+            self._series_index, self._series_count,
+        ) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"Snapshot de catalogo invalido: {path}")
+
+    def movie_list(self) -> bytes:
+        """JSON del listado completo de peliculas."""
+        return self._map[self._list_offset:self._list_offset + self._list_length]
+
+    def movie(self, movie_id: int) -> bytes | None:
+        """JSON de una pelicula o ``None`` si no existe."""
+        return self._lookup(self._movies_index, self._movies_count, movie_id)
+
+    def series(self, series_id: int) -> bytes | None:
+        """JSON de una serie con sus temporadas o ``None`` si no existe."""
+        return self._lookup(self._series_index, self._series_count, series_id)
+
+    def _lookup(self, index_offset: int, count: int, item_id: int) -> bytes | None:
+        low, high = 0, count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            current_id, offset, length = INDEX_ENTRY.unpack_from(
+                self._map, index_offset + middle * INDEX_ENTRY.size
+            )
+            if current_id == item_id:
+                return self._map[offset:offset + length]
+            if current_id < item_id:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+
+def _serialize_catalog() -> tuple[list[tuple[int, bytes]], list[tuple[int, bytes]]]:
+    """Lee el catalogo (temporadas en un solo SELECT extra) y lo serializa a JSON."""
+    def dumps(payload) -> str:
+        # Compacto, igual que jsonify: son los bytes que se envian tal cual
+        return current_app.json.dumps(payload, separators=(",", ":"))
+
+    movies = [
+        (movie.id, dumps(movie.to_dict()).encode("utf-8"))
+        for movie in Movie.query.order_by(Movie.id).all()
+    ]
+    series_records = []
+    for series in Series.query.options(selectinload(Series.seasons)).order_by(Series.id).all():
+        # Mismo payload que SeriesService.get_series_with_seasons
+        series_data = series.to_dict()
+        series_data["seasons"] = [season.to_dict() for season in series.seasons]
+        series_records.append((series.id, dumps(series_data).encode("utf-8")))
+    return movies, series_records
+
+
+def _write_snapshot(path: Path, movies, series_records) -> None:
+    body = bytearray()
+    movie_entries = []
+    series_entries = []
+
+    list_offset = HEADER.size
+    body += b"["
+    for position, (movie_id, record) in enumerate(movies):
+        if position:
+            body += b","
+        movie_entries.append((movie_id, HEADER.size + len(body), len(record)))
+        body += record
+    body += b"]"
+    list_length = HEADER.size + len(body) - list_offset
+
+    for series_id, record in series_records:
+        series_entries.append((series_id, HEADER.size + len(body), len(record)))
+        body += record
+
+    movies_index = HEADER.size + len(body)
+    for entry in movie_entries:
+        body += INDEX_ENTRY.pack(*entry)
+    series_index = HEADER.size + len(body)
+    for entry in series_entries:
+        body += INDEX_ENTRY.pack(*entry)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, time.time_ns(),
+        list_offset, list_length,
+        movies_index, len(movie_entries),
+        series_index, len(series_entries),
+    )
+    descriptor, temp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(header)
+            handle.write(body)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def snapshot_path() -> Path:
+    """Ruta configurada del archivo de snapshot."""
+    return Path(current_app.config["CATALOG_SNAPSHOT_PATH"])
+
+
+def build_snapshot() -> Path:
+    """Genera un snapshot nuevo y lo publica atomicamente."""
+    path = snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix(".lock"), "a") as lock_file:
+        # El lock serializa builds de distintos workers: como cada uno lee la BD
+        # despues de obtenerlo, el ultimo en publicar siempre tiene los datos mas nuevos.
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            movies, series_records = _serialize_catalog()
+            _write_snapshot(path, movies, series_records)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    return path
+
+
+_lock = threading.Lock()
+_current: CatalogSnapshot | None = None
+_last_check = 0.0
+# Hay escrituras de este worker que el snapshot publicado todavia no incluye
+_stale = False
+# Hubo escrituras desde que empezo el ultimo build
+_dirty = False
+_timer: threading.Timer | None = None
+
+
+def get_snapshot() -> CatalogSnapshot | None:
+    """Snapshot vigente del worker o ``None`` si esta deshabilitado o no se pudo
+    generar/abrir; con ``None`` las vistas leen de la base de datos."""
+    global _current, _last_check
+    config = current_app.config
+    if not config.get("CATALOG_SNAPSHOT_ENABLED"):
+        return None
+
+    if _stale:
+        # Lee sus propias escrituras hasta que las publique un build posterior
+        return None
+
+    now = time.monotonic()
+    # Tambien tras un fallo (_current = None): no se reintenta en cada request
+    if now - _last_check < config.get("CATALOG_SNAPSHOT_CHECK_SECONDS", 1):
+        return _current
+
+    with _lock:
+        _last_check = now
+        path = snapshot_path()
+        try:
+            try:
+                inode = os.stat(path).st_ino
+            except FileNotFoundError:
+                build_snapshot()
+                inode = os.stat(path).st_ino
+            if _current is None or _current.inode != inode:
+                # El mapeo anterior se libera cuando ningun request lo este usando
+                _current = CatalogSnapshot(path)
+        except Exception:  # noqa: BLE001 - el snapshot es una optimizacion, nunca debe romper un request
+            current_app.logger.exception("No se pudo generar o abrir el snapshot del catalogo %s", path)
+            _current = None
+        return _current
+
+
+def _rebuild(app: Flask) -> None:
+    """Regenera el snapshot; un fallo se registra y nunca llega al request que escribio."""
+    global _dirty, _last_check, _stale, _timer
+    with app.app_context():
+        with _lock:
+            _dirty = False
+            _timer = None
+        try:
+            build_snapshot()
+        except Exception:  # noqa: BLE001 - la escritura ya esta confirmada en la BD
+            app.logger.exception("No se pudo regenerar el snapshot del catalogo")
+            return
+        finally:
+            with _lock:
+                _last_check = 0.0
+        with _lock:
+            # Si hubo escrituras durante el build, las publica el siguiente
+            if not _dirty:
+                _stale = False
+
+
+def refresh() -> None:
+    """Programa la regeneracion del snapshot tras una escritura del catalogo (no-op si esta deshabilitado)."""
+    global _dirty, _stale, _timer
+    config = current_app.config
+    if not config.get("CATALOG_SNAPSHOT_ENABLED"):
+        return
+    app = current_app._get_current_object()
+    delay = config.get("CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS", 0.5)
+    with _lock:
+        _stale = True
+        _dirty = True
+        if delay > 0:
+            if _timer is None:
+                _timer = threading.Timer(delay, _rebuild, args=(app,))
+                _timer.daemon = True
+                _timer.start()
+            return
+    _rebuild(app)
@@ -0,0 +1,96 @@
+"""Comandos de consola (``flask <comando>``) para tareas offline/periodicas."""
+
+from __future__ import annotations
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+
+
+@click.command("build-similar-titles")
+@click.option("--full", is_flag=True, help="Recalcula todos los titulos en lugar de solo los afectados.")
+@with_appcontext
+def build_similar_titles_command(full: bool) -> None:
+    """Precalcula los titulos similares a partir de co-ocurrencia y genero/director."""
+    from .jobs.similar_titles import build_similar_titles
+
+    written = build_similar_titles(full=full)
+    click.echo(f"similar_titles: {written} titulos actualizados")
+
+
+@click.command("flush-trending")
+@with_appcontext
+def flush_trending_command() -> None:
+    """Poda los buckets de tendencias fuera de la ventana y muestra el top actual."""
+    from . import trending
+
+    trending.flush()
+    for metric in trending.METRICS:
+        click.echo(f"{metric}: {len(trending.get_top(metric))} titulos en el ranking")
+
+
+@click.command("build-catalog-snapshot")
+@with_appcontext
+def build_catalog_snapshot_command() -> None:
+    """Genera el snapshot del catalogo que comparten los workers (util en el deploy)."""
+    from .catalog_snapshot import build_snapshot
+
+    path = build_snapshot()
+    click.echo(f"catalog snapshot: {path}")
+
+
+@click.command("archive-watch-entries")
+@click.option("--older-than-days", type=int, default=None, help="Antiguedad minima (por defecto WATCHLIST_ARCHIVE_AFTER_DAYS).")
+@with_appcontext
+def archive_watch_entries_command(older_than_days: int | None) -> None:
+    """Mueve al historial las entradas completadas hace tiempo."""
+    from .jobs.archive import archive_completed_entries
+
+    try:
+        archived = archive_completed_entries(older_than_days=older_than_days)
+    except RuntimeError as error:
+        raise click.ClickException(str(error)) from error
+    click.echo(f"watch_entries_history: {archived} entradas archivadas")
+
+
+@click.command("shards-init")
+@with_appcontext
+def shards_init_command() -> None:
+    """Crea las tablas de watch_entries en cada shard configurado."""
+    from . import sharding
+
+    sharding.create_shard_tables()
+    click.echo(f"shards: {', '.join(sharding.shard_keys()) or 'ninguno configurado'}")
+
+
+@click.command("reshard")
+@click.option("--user-ids", default=None, help="Lista de ids separados por coma a mover a --to.")
+@click.option("--to", "target", default=None, help="Shard destino para --user-ids.")
+@click.option("--batch-size", type=int, default=None, help="Usuarios por lote (por defecto SHARD_MOVE_BATCH_SIZE).")
+@with_appcontext
+def reshard_command(user_ids: str | None, target: str | None, batch_size: int | None) -> None:
+    """Mueve usuarios entre shards; sin opciones rebalancea segun la configuracion actual."""
+    from . import sharding
+
+    if not sharding.is_enabled():
+        raise click.ClickException("No hay shards configurados (WATCH_ENTRY_SHARD_URLS).")
+
+    if user_ids:
+        if not target:
+            raise click.UsageError("--user-ids requiere --to")
+        ids = [int(user_id) for user_id in user_ids.split(",") if user_id.strip()]
+        size = batch_size or len(ids)
+        moved = sum(sharding.move_users(ids[start:start + size], target) for start in range(0, len(ids), size))
+    else:
+        moved = sharding.rebalance(batch_size=batch_size)
+    click.echo(f"reshard: {moved} usuarios movidos")
+
+
+def register_commands(app: Flask) -> None:
+    """Agrega los comandos CLI del proyecto a la aplicacion."""
+    app.cli.add_command(build_similar_titles_command)
+    app.cli.add_command(flush_trending_command)
+    app.cli.add_command(build_catalog_snapshot_command)
+    app.cli.add_command(archive_watch_entries_command)
+    app.cli.add_command(shards_init_command)
+    app.cli.add_command(reshard_command)
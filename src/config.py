@@ -9,6 +9,9 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 INSTANCE_PATH = BASE_DIR / "instance"
 
+# Shards de watch_entries: URIs separadas por coma (vacio = sin sharding)
+WATCH_ENTRY_SHARD_URLS = [url for url in os.getenv("WATCH_ENTRY_SHARD_URLS", "").split(",") if url.strip()]
+
 
 class BaseConfig:
     """Config comun a cualquier entorno."""
@@ -20,6 +23,35 @@ class BaseConfig:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JSON_SORT_KEYS = False
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    SIMILAR_TITLES_TOP_K = int(os.getenv("SIMILAR_TITLES_TOP_K", "20"))
+    # Peso de la co-ocurrencia frente al solapamiento genero/director (0..1)
+    SIMILAR_TITLES_BLEND = float(os.getenv("SIMILAR_TITLES_BLEND", "0.7"))
+    TRENDING_BUCKET_MINUTES = int(os.getenv("TRENDING_BUCKET_MINUTES", "60"))
+    TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", "168"))
+    TRENDING_FLUSH_SECONDS = int(os.getenv("TRENDING_FLUSH_SECONDS", "30"))
+    TRENDING_TOP_N = int(os.getenv("TRENDING_TOP_N", "50"))
+    CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT_ENABLED", "1") == "1"
+    CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", str(INSTANCE_PATH / "catalog.snap"))
+    CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_CHECK_SECONDS", "1"))
+    # Espera antes de regenerar tras una escritura (agrupa rafagas); 0 = en el mismo request
+    CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS", "0.5"))
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "512"))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+    MULTI_GET_MAX_IDS = int(os.getenv("MULTI_GET_MAX_IDS", "100"))
+    WATCHLIST_ARCHIVE_AFTER_DAYS = int(os.getenv("WATCHLIST_ARCHIVE_AFTER_DAYS", "30"))
+    WATCHLIST_ARCHIVE_BATCH_SIZE = int(os.getenv("WATCHLIST_ARCHIVE_BATCH_SIZE", "1000"))
+    # Ignorar progreso hacia atras (dispositivos atrasados) salvo que el request diga lo contrario
+    PROGRESS_MONOTONIC_DEFAULT = os.getenv("PROGRESS_MONOTONIC_DEFAULT", "0") == "1"
+    SQLALCHEMY_BINDS = {f"watch_shard_{index}": url.strip() for index, url in enumerate(WATCH_ENTRY_SHARD_URLS)}
+    WATCH_ENTRY_SHARDS = list(SQLALCHEMY_BINDS)
+    SHARD_ID_BLOCK_SIZE = int(os.getenv("SHARD_ID_BLOCK_SIZE", "1000"))
+    SHARD_MOVE_BATCH_SIZE = int(os.getenv("SHARD_MOVE_BATCH_SIZE", "500"))
+    # Pasadas de reaplicacion al mover usuarios (escrituras en vuelo hacia el shard de origen)
+    SHARD_CATCH_UP_ROUNDS = int(os.getenv("SHARD_CATCH_UP_ROUNDS", "3"))
 
 
 class DevelopmentConfig(BaseConfig):
@@ -33,6 +65,9 @@ class TestingConfig(BaseConfig):
 
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    CATALOG_SNAPSHOT_ENABLED = False
+    SQLALCHEMY_BINDS: dict[str, str] = {}
+    WATCH_ENTRY_SHARDS: list[str] = []
 
 
 class ProductionConfig(BaseConfig):
@@ -0,0 +1,5 @@
+"""Acceso a la instancia compartida de SQLAlchemy para modelos y servicios."""
+
+from .extensions import db
+
+__all__ = ["db"]
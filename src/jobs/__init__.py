@@ -0,0 +1 @@
+"""Tareas offline/periodicas que se ejecutan fuera del ciclo de request."""
@@ -0,0 +1,94 @@
+"""Mueve entradas completadas antiguas de ``watch_entries`` al historial.
+
+Cada lote borra las filas de la tabla activa con ``DELETE ... RETURNING`` y
+las inserta en el historial en la misma transaccion, asi que una entrada nunca
+queda en ambas tablas ni en ninguna. El ``DELETE`` repite el filtro
+(``completed`` y ``updated_at`` viejo): una entrada que se actualizo despues de
+elegir el lote sigue activa.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, text
+
+from src import sharding
+from src.models.watch_entry import WatchEntry
+from src.models.watch_entry_archive import WatchEntryArchive
+
+
+def archive_completed_entries(older_than_days: int | None = None, batch_size: int | None = None) -> int:
+    """Archiva por lotes las entradas ``completed`` sin cambios hace mas de ``older_than_days``.
+
+    Con sharding se recorre cada shard (y la base principal); ambas tablas
+    viven siempre en la misma base, asi que cada lote sigue siendo atomico.
+    """
+    config = current_app.config
+    if older_than_days is None:
+        older_than_days = config.get("WATCHLIST_ARCHIVE_AFTER_DAYS", 30)
+    if batch_size is None:
+        batch_size = config.get("WATCHLIST_ARCHIVE_BATCH_SIZE", 1000)
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    hot = WatchEntry.__table__
+    history = WatchEntryArchive.__table__
+    columns = WatchEntryArchive.SHARED_COLUMNS
+
+    archived = 0
+    for shard_key, session in sharding.iter_sessions():
+        # En los shards los ids los reparte sharding.next_entry_id, nunca el autoincrement
+        if shard_key is None and not sharding.is_enabled() and _reuses_ids(session):
+            raise RuntimeError(
+                "watch_entries se creo sin AUTOINCREMENT: SQLite puede reasignar el id de una "
+                "entrada archivada. Hay que recrear la tabla antes de archivar (ver README)."
+            )
+        archived += _archive_location(session, hot, history, columns, cutoff, batch_size)
+    return archived
+
+
+def _reuses_ids(session) -> bool:
+    """Indica si la tabla activa puede reutilizar ids borrados (SQLite sin ``AUTOINCREMENT``)."""
+    if session.get_bind().dialect.name != "sqlite":
+        return False
+    ddl = session.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": WatchEntry.__tablename__},
+    )
+    return ddl is not None and "AUTOINCREMENT" not in ddl.upper()
+
+
+def _archive_location(session, hot, history, columns, cutoff, batch_size: int) -> int:
+    archivable = (hot.c.status == "completed") & (hot.c.updated_at < cutoff)
+    returning = session.get_bind().dialect.delete_returning
+    archived = 0
+    while True:
+        stmt = select(hot.c.id).where(archivable).order_by(hot.c.id).limit(batch_size)
+        if not returning:
+            # Sin RETURNING se bloquea el lote hasta el commit; otro archivador salta esas filas
+            stmt = stmt.with_for_update(skip_locked=True)
+        ids = session.scalars(stmt).all()
+        if not ids:
+            break
+
+        batch = hot.c.id.in_(ids) & archivable
+        if returning:
+            # Lo que se inserta es exactamente lo que se borro, con los valores del borrado
+            rows = session.execute(
+                delete(hot).where(batch).returning(*(hot.c[column] for column in columns))
+            ).mappings().all()
+            if rows:
+                session.execute(insert(history), [dict(row) for row in rows])
+            count = len(rows)
+        else:
+            session.execute(
+                insert(history).from_select(
+                    list(columns), select(*(hot.c[column] for column in columns)).where(batch)
+                )
+            )
+            count = session.execute(delete(hot).where(batch)).rowcount
+        session.commit()
+        archived += count
+
+    return archived
@@ -0,0 +1,293 @@
+"""Construccion de la tabla de "titulos similares".
+
+Combina la co-ocurrencia de titulos en las watchlists de los usuarios con el
+solapamiento de genero/director del catalogo. Todo el calculo se hace con
+matrices dispersas de SciPy; por request solo se lee ``SimilarTitle``.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+import numpy as np
+from flask import current_app
+from scipy import sparse
+from sqlalchemy import func, select
+
+from src import sharding
+from src.database import db
+from src.models.movie import Movie
+from src.models.series import Series
+from src.models.similar_title import SimilarTitle
+from src.models.similar_title_change import SimilarTitleChange
+from src.models.watch_entry import WatchEntry
+from src.models.watch_entry_archive import WatchEntryArchive
+
+ROWS_PER_CHUNK = 1024
+
+
+def _tokens(value: str | None) -> set[str]:
+    """Separa un campo libre (``"Drama, Crimen"``) en tokens normalizados."""
+    return {token.strip().lower() for token in (value or "").split(",") if token.strip()}
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Normaliza cada fila a norma L2 = 1 para que el producto sea un coseno."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(inverse) @ matrix
+
+
+def load_catalog() -> tuple[list[tuple[str, int]], list[str], sparse.csr_matrix]:
+    """Devuelve las llaves ``(tipo, id)``, los titulos y la matriz de features de contenido."""
+    keys: list[tuple[str, int]] = []
+    titles: list[str] = []
+    rows: list[int] = []
+    cols: list[int] = []
+    vocabulary: dict[str, int] = {}
+
+    def add_features(features: set[str]) -> None:
+        for feature in features:
+            rows.append(len(keys) - 1)
+            cols.append(vocabulary.setdefault(feature, len(vocabulary)))
+
+    for movie in db.session.execute(select(Movie.id, Movie.title, Movie.genre, Movie.director)):
+        keys.append(("movie", movie.id))
+        titles.append(movie.title)
+        features = {f"genre:{genre}" for genre in _tokens(movie.genre)}
+        features |= {f"director:{director}" for director in _tokens(movie.director)}
+        add_features(features)
+
+    for series in db.session.execute(select(Series.id, Series.title, Series.genre)):
+        keys.append(("series", series.id))
+        titles.append(series.title)
+        add_features({f"genre:{genre}" for genre in _tokens(series.genre)})
+
+    features = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(keys), max(len(vocabulary), 1)),
+    )
+    return keys, titles, features
+
+
+def load_interactions(
+    item_index: dict[tuple[str, int], int], batch_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Lee ``(item, user)`` de todas las entradas (activas e historial) con un cursor del lado del servidor."""
+    items = array("q")
+    users = array("q")
+    for _, session in sharding.iter_sessions():
+        for model in (WatchEntry, WatchEntryArchive):
+            stmt = select(model.user_id, model.content_type, model.content_id).execution_options(
+                stream_results=True, yield_per=batch_size
+            )
+            for user_id, content_type, content_id in session.execute(stmt):
+                index = item_index.get((content_type, content_id))
+                if index is not None:
+                    items.append(index)
+                    users.append(user_id)
+    return np.array(items, dtype=np.int64), np.array(users, dtype=np.int64)
+
+
+def build_interaction_matrix(items: np.ndarray, users: np.ndarray, n_items: int) -> sparse.csr_matrix:
+    """Matriz binaria item x usuario (1 si el usuario tiene el titulo en su watchlist)."""
+    _, user_columns = np.unique(users, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(items), dtype=np.float32), (items, user_columns)),
+        shape=(n_items, int(user_columns.max()) + 1 if len(user_columns) else 1),
+    )
+    matrix.data[:] = 1.0  # colapsa duplicados
+    return matrix
+
+
+def top_k_neighbors(scores: sparse.csr_matrix, row_ids: np.ndarray, top_k: int):
+    """Para cada fila devuelve ``[(indice, score), ...]`` ordenado, sin el propio titulo."""
+    for position, item in enumerate(row_ids):
+        start, end = scores.indptr[position], scores.indptr[position + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = (columns != item) & (values > 0)
+        columns, values = columns[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            columns, values = columns[best], values[best]
+        order = np.argsort(-values, kind="stable")
+        yield item, list(zip(columns[order].tolist(), values[order].tolist()))
+
+
+def read_pending_changes() -> tuple[list[int], set[int], set[tuple[str, int]]]:
+    """Marcas pendientes de ``SimilarTitleChange``: ids leidos, usuarios y titulos afectados.
+
+    Se leen antes de escanear catalogo y entradas: toda marca leida corresponde a
+    una escritura ya visible en ese escaneo. Al terminar se borran exactamente
+    estos ids; las marcas que aparezcan mientras tanto (aunque tengan un id menor,
+    como una secuencia de Postgres cuyo commit llega tarde) quedan para el proximo.
+    """
+    change_ids = []
+    changed_users = set()
+    changed_keys = set()
+    for change_id, content_type, content_id, user_id in db.session.execute(
+        select(
+            SimilarTitleChange.id, SimilarTitleChange.content_type,
+            SimilarTitleChange.content_id, SimilarTitleChange.user_id,
+        )
+    ):
+        change_ids.append(change_id)
+        changed_keys.add((content_type, content_id))
+        if user_id is not None:
+            changed_users.add(user_id)
+    return change_ids, changed_users, changed_keys
+
+
+def _changed_items(
+    items: np.ndarray,
+    users: np.ndarray,
+    keys: list[tuple[str, int]],
+    item_index: dict[tuple[str, int], int],
+    changed_users: set[int],
+    changed_keys: set[tuple[str, int]],
+    related,
+    batch_size: int,
+) -> tuple[np.ndarray, list[tuple[str, int]]]:
+    """Titulos afectados por las marcas pendientes y filas de ``SimilarTitle`` de titulos eliminados.
+
+    Afectados: todo lo que tienen los usuarios que agregaron o borraron entradas
+    (cualquier par cuya co-ocurrencia cambio), los titulos creados/editados/borrados
+    del catalogo junto con los que hoy comparten score con ellos (``related``) o los
+    listan como vecino, y los titulos sin fila aun. El progreso no cambia la
+    co-ocurrencia, asi que no hace falta mirar ``updated_at``.
+    """
+    changed_users = np.fromiter(changed_users, dtype=np.int64, count=len(changed_users))
+    affected = set(np.unique(items[np.isin(users, changed_users)]).tolist())
+
+    changed_indexes = np.array(
+        sorted(item_index[key] for key in changed_keys if key in item_index), dtype=np.int64
+    )
+    affected.update(changed_indexes.tolist())
+    if len(changed_indexes):
+        affected.update(related(changed_indexes).tolist())
+
+    # Con los datos viejos (titulo, genero, titulo borrado) solo quedan las filas que los listan
+    processed = set()
+    removed = []
+    stmt = select(
+        SimilarTitle.content_type, SimilarTitle.content_id, SimilarTitle.neighbors
+    ).execution_options(yield_per=batch_size)
+    for content_type, content_id, neighbors in db.session.execute(stmt):
+        key = (content_type, content_id)
+        if key not in item_index:
+            removed.append(key)
+            continue
+        processed.add(key)
+        if changed_keys and any(
+            (neighbor["content_type"], neighbor["content_id"]) in changed_keys for neighbor in neighbors
+        ):
+            affected.add(item_index[key])
+
+    affected.update(index for index, key in enumerate(keys) if key not in processed)
+    return np.array(sorted(affected), dtype=np.int64), removed
+
+
+def build_similar_titles(full: bool = False) -> int:
+    """Recalcula los vecinos; incremental por defecto. Devuelve cuantos titulos se escribieron."""
+    config = current_app.config
+    top_k = config.get("SIMILAR_TITLES_TOP_K", 20)
+    blend = config.get("SIMILAR_TITLES_BLEND", 0.7)
+    batch_size = config.get("EXPORT_BATCH_SIZE", 1000)
+
+    build_started_at = db.session.scalar(select(func.now()))
+    incremental = not full and db.session.scalar(select(SimilarTitle.content_id).limit(1)) is not None
+    change_ids, changed_users, changed_keys = read_pending_changes()
+
+    keys, titles, features = load_catalog()
+    if not keys:
+        return 0
+    item_index = {key: index for index, key in enumerate(keys)}
+    items, users = load_interactions(item_index, batch_size)
+
+    interactions = _normalize_rows(build_interaction_matrix(items, users, len(keys)))
+    features = _normalize_rows(features)
+    interactions_t = interactions.T.tocsr()
+    features_t = features.T.tocsr()
+
+    def blended_scores(rows: np.ndarray) -> sparse.csr_matrix:
+        return (
+            blend * (interactions[rows] @ interactions_t)
+            + (1 - blend) * (features[rows] @ features_t)
+        ).tocsr()
+
+    def related(rows: np.ndarray) -> np.ndarray:
+        """Titulos con score no nulo frente a alguno de ``rows``."""
+        columns = [
+            blended_scores(rows[start:start + ROWS_PER_CHUNK]).indices
+            for start in range(0, len(rows), ROWS_PER_CHUNK)
+        ]
+        return np.unique(np.concatenate(columns))
+
+    if not incremental:
+        targets = np.arange(len(keys), dtype=np.int64)
+    else:
+        targets, removed = _changed_items(
+            items, users, keys, item_index, changed_users, changed_keys, related, batch_size
+        )
+        for content_type, content_id in removed:
+            db.session.execute(
+                SimilarTitle.__table__.delete().where(
+                    SimilarTitle.content_type == content_type,
+                    SimilarTitle.content_id == content_id,
+                )
+            )
+
+    written = 0
+    for start in range(0, len(targets), ROWS_PER_CHUNK):
+        chunk = targets[start:start + ROWS_PER_CHUNK]
+        scores = blended_scores(chunk)
+
+        for content_type in ("movie", "series"):
+            ids = [keys[index][1] for index in chunk.tolist() if keys[index][0] == content_type]
+            if ids:
+                db.session.execute(
+                    SimilarTitle.__table__.delete().where(
+                        SimilarTitle.content_type == content_type,
+                        SimilarTitle.content_id.in_(ids),
+                    )
+                )
+
+        rows = []
+        for item, neighbors in top_k_neighbors(scores, chunk, top_k):
+            content_type, content_id = keys[item]
+            rows.append({
+                "content_type": content_type,
+                "content_id": content_id,
+                "neighbors": [
+                    {
+                        "content_type": keys[neighbor][0],
+                        "content_id": keys[neighbor][1],
+                        "title": titles[neighbor],
+                        "score": round(score, 4),
+                    }
+                    for neighbor, score in neighbors
+                ],
+                "updated_at": build_started_at,
+            })
+        if rows:
+            db.session.execute(SimilarTitle.__table__.insert(), rows)
+        db.session.commit()
+        written += len(rows)
+
+    if not incremental:
+        # Cada fila se reemplaza en su chunk (sin ventana con la tabla vacia); al final
+        # solo quedan por borrar los titulos que ya no existen en el catalogo.
+        db.session.execute(
+            SimilarTitle.__table__.delete().where(SimilarTitle.updated_at < build_started_at)
+        )
+
+    # Solo las marcas leidas al empezar: las demas quedan para el proximo build
+    for start in range(0, len(change_ids), batch_size):
+        db.session.execute(
+            SimilarTitleChange.__table__.delete().where(
+                SimilarTitleChange.id.in_(change_ids[start:start + batch_size])
+            )
+        )
+    db.session.commit()
+    return written
@@ -1,10 +1,26 @@
 """Coleccion de modelos disponibles en la aplicacion."""
 
 # TODO: exponer nuevos modelos cuando se creen.
+from .id_block import IdBlock  # noqa: F401
 from .movie import Movie  # noqa: F401
 from .seasons import Season  # noqa: F401
 from .series import Series  # noqa: F401
+from .similar_title import SimilarTitle  # noqa: F401
+from .similar_title_change import SimilarTitleChange  # noqa: F401
+from .trending_count import TrendingCount  # noqa: F401
 from .user import User  # noqa: F401
 from .watch_entry import WatchEntry  # noqa: F401
+from .watch_entry_archive import WatchEntryArchive  # noqa: F401
 
-__all__ = ["Movie", "Season", "Series", "User", "WatchEntry"]
+__all__ = [
+    "IdBlock",
+    "Movie",
+    "Season",
+    "Series",
+    "SimilarTitle",
+    "SimilarTitleChange",
+    "TrendingCount",
+    "User",
+    "WatchEntry",
+    "WatchEntryArchive",
+]
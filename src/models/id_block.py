@@ -0,0 +1,14 @@
+from src.database import db
+
+# Contadores para reservar bloques de ids globales (ids de watch_entries repartidas en shards)
+class IdBlock(db.Model):
+    __tablename__ = 'id_blocks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'next_value': self.next_value
+        }
\ No newline at end of file
@@ -13,8 +13,11 @@ class Movie(db.Model):
     director = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     
-    # Relación con WatchEntry
-    watch_entries = relationship('WatchEntry', back_populates='movie')
+    # Relación con WatchEntry (content_id no es FK: apunta a movies o series según content_type)
+    watch_entries = relationship(
+        'WatchEntry', back_populates='movie', viewonly=True,
+        primaryjoin="and_(Movie.id == foreign(WatchEntry.content_id), WatchEntry.content_type == 'movie')"
+    )
     
     def to_dict(self):
         return {
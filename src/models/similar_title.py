@@ -0,0 +1,26 @@
+from src.database import db
+
+# Vecinos precalculados (top-K) de cada titulo; los escribe src/jobs/similar_titles.py
+class SimilarTitle(db.Model):
+    __tablename__ = 'similar_titles'
+    
+    content_type = db.Column(db.String(20), primary_key=True)  # 'movie' o 'series'
+    content_id = db.Column(db.Integer, primary_key=True)
+    neighbors = db.Column(db.JSON, nullable=False, default=list)  # [{content_type, content_id, title, score}]
+    updated_at = db.Column(db.DateTime, nullable=False)
+    
+    @classmethod
+    def get_neighbors(cls, content_type, content_id, limit=None):
+        """Lectura O(1) por llave primaria; None si el titulo aun no fue procesado"""
+        row = db.session.get(cls, (content_type, content_id))
+        if row is None:
+            return None
+        return row.neighbors[:limit] if limit else row.neighbors
+    
+    def to_dict(self):
+        return {
+            'content_type': self.content_type,
+            'content_id': self.content_id,
+            'neighbors': self.neighbors,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
\ No newline at end of file
@@ -0,0 +1,25 @@
+from src.database import db
+
+# Marcas para el refresco incremental de similares: altas y bajas de la watchlist y
+# ediciones del catálogo. El build borra por id solo las marcas que leyó
+class SimilarTitleChange(db.Model):
+    __tablename__ = 'similar_title_changes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_type = db.Column(db.String(20), nullable=False)  # 'movie' o 'series'
+    content_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer)  # dueño de la entrada borrada; None = cambio del catálogo
+    changed_at = db.Column(db.DateTime, server_default=db.func.now(), index=True)
+    
+    @classmethod
+    def mark(cls, content_type, content_id, user_id=None):
+        """Registra el cambio en la sesión principal (lo confirma el commit de quien llama)"""
+        db.session.add(cls(content_type=content_type, content_id=content_id, user_id=user_id))
+    
+    def to_dict(self):
+        return {
+            'content_type': self.content_type,
+            'content_id': self.content_id,
+            'user_id': self.user_id,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
\ No newline at end of file
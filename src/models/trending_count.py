@@ -0,0 +1,20 @@
+from src.database import db
+
+# Conteos agregados por bucket de tiempo; cada worker suma sus deltas al hacer flush
+class TrendingCount(db.Model):
+    __tablename__ = 'trending_counts'
+    
+    metric = db.Column(db.String(20), primary_key=True)  # 'added' o 'completed'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    content_type = db.Column(db.String(20), primary_key=True)  # 'movie' o 'series'
+    content_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'metric': self.metric,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'content_type': self.content_type,
+            'content_id': self.content_id,
+            'count': self.count
+        }
\ No newline at end of file
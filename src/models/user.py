@@ -7,10 +7,12 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    shard = db.Column(db.String(50))  # bind de sus watch_entries; None = base principal
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     
     # Relación con WatchEntry
     watch_entries = relationship('WatchEntry', back_populates='user', cascade='all, delete-orphan')
+    watch_history = relationship('WatchEntryArchive', back_populates='user', cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -1,42 +1,21 @@
 from src.database import db
 from sqlalchemy.orm import relationship
 from sqlalchemy import CheckConstraint
+from src import trending
 
-class WatchEntry(db.Model):
-    __tablename__ = 'watch_entries'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    content_type = db.Column(db.String(20), nullable=False)  # 'movie' o 'series'
-    content_id = db.Column(db.Integer, nullable=False)  # ID de movie o series
-    status = db.Column(db.String(20), nullable=False)  # 'pending', 'watching', 'completed'
-    current_progress = db.Column(db.Integer, default=0)  # minutos vistos o episodios vistos
-    total_duration = db.Column(db.Integer, nullable=False)  # duración total en minutos o episodios
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
-    
-    # Relaciones
-    user = relationship('User', back_populates='watch_entries')
-    movie = relationship('Movie', back_populates='watch_entries')
-    
-    # Restricción de check para status
-    __table_args__ = (
-        CheckConstraint(
-            status.in_(['pending', 'watching', 'completed']), 
-            name='check_status'
-        ),
-        CheckConstraint(
-            content_type.in_(['movie', 'series']), 
-            name='check_content_type'
-        ),
-    )
+# Comportamiento compartido por la tabla activa y el historial (WatchEntryArchive)
+class WatchEntryMixin:
+    @staticmethod
+    def compute_percentage(current_progress, total_duration):
+        """Calcula el porcentaje a partir de valores crudos (sin instanciar el modelo)"""
+        if not total_duration:
+            return 0
+        return round(((current_progress or 0) / total_duration) * 100, 2)
     
     @property
     def percentage_watched(self):
         """Calcula el porcentaje de progreso"""
-        if self.total_duration == 0:
-            return 0
-        return round((self.current_progress / self.total_duration) * 100, 2)
+        return self.compute_percentage(self.current_progress, self.total_duration)
     
     def to_dict(self):
         return {
@@ -48,13 +27,16 @@ class WatchEntry(db.Model):
             'current_progress': self.current_progress,
             'total_duration': self.total_duration,
             'percentage_watched': self.percentage_watched,
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
     def update_progress(self, progress, total_duration=None):
         """Actualiza el progreso y calcula el estado"""
+        previous_status = self.status
         self.current_progress = progress
+        self.version = (self.version or 0) + 1
         
         if total_duration:
             self.total_duration = total_duration
@@ -66,4 +48,43 @@ class WatchEntry(db.Model):
             self.status = 'completed'
             self.current_progress = self.total_duration
         else:
-            self.status = 'watching'
\ No newline at end of file
+            self.status = 'watching'
+        
+        # Alimentar el ranking "más completados" solo en la transición
+        if self.status == 'completed' and previous_status != 'completed':
+            trending.record('completed', self.content_type, self.content_id)
+
+class WatchEntry(WatchEntryMixin, db.Model):
+    __tablename__ = 'watch_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content_type = db.Column(db.String(20), nullable=False)  # 'movie' o 'series'
+    content_id = db.Column(db.Integer, nullable=False)  # ID de movie o series
+    status = db.Column(db.String(20), nullable=False)  # 'pending', 'watching', 'completed'
+    current_progress = db.Column(db.Integer, default=0)  # minutos vistos o episodios vistos
+    total_duration = db.Column(db.Integer, nullable=False)  # duración total en minutos o episodios
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # control de concurrencia optimista (ETag)
+    
+    # Relaciones
+    user = relationship('User', back_populates='watch_entries')
+    movie = relationship(
+        'Movie', back_populates='watch_entries', viewonly=True,
+        primaryjoin="and_(Movie.id == foreign(WatchEntry.content_id), WatchEntry.content_type == 'movie')"
+    )
+    
+    # Restricción de check para status
+    __table_args__ = (
+        CheckConstraint(
+            status.in_(['pending', 'watching', 'completed']), 
+            name='check_status'
+        ),
+        CheckConstraint(
+            content_type.in_(['movie', 'series']), 
+            name='check_content_type'
+        ),
+        # Sin reutilizar ids en SQLite: las entradas archivadas conservan su id
+        {'sqlite_autoincrement': True},
+    )
\ No newline at end of file
@@ -0,0 +1,45 @@
+from src.database import db
+from sqlalchemy.orm import object_session, relationship
+from src.models.watch_entry import WatchEntry, WatchEntryMixin
+
+# Historial (tier frío): entradas 'completed' antiguas movidas fuera de watch_entries
+class WatchEntryArchive(WatchEntryMixin, db.Model):
+    __tablename__ = 'watch_entries_history'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # mismo id que tenía en watch_entries
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    content_type = db.Column(db.String(20), nullable=False)
+    content_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    current_progress = db.Column(db.Integer, default=0)
+    total_duration = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+    
+    # Relaciones
+    user = relationship('User', back_populates='watch_history')
+    
+    # Columnas que se copian tal cual entre watch_entries y el historial
+    SHARED_COLUMNS = (
+        'id', 'user_id', 'content_type', 'content_id', 'status',
+        'current_progress', 'total_duration', 'created_at', 'updated_at', 'version'
+    )
+    
+    def to_dict(self):
+        data = super().to_dict()
+        data['archived_at'] = self.archived_at.isoformat() if self.archived_at else None
+        return data
+    
+    def restore(self):
+        """Devuelve la entrada a watch_entries (p. ej. al dejar de estar completada)"""
+        # Misma sesión que la entrada archivada (puede ser la de un shard)
+        session = object_session(self) or db.session
+        # Sin updated_at: vuelve con el de ahora (server default), como cualquier otra escritura
+        watch_entry = WatchEntry(**{
+            column: getattr(self, column) for column in self.SHARED_COLUMNS if column != 'updated_at'
+        })
+        session.delete(self)
+        session.add(watch_entry)
+        return watch_entry
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Negociacion de contenido para las respuestas de la API.
+
+``Accept`` elige entre JSON y MessagePack; ``Accept-Encoding`` entre brotli,
+gzip o sin comprimir. Cuando la ruta indica una ``cache_key`` (respuestas que
+solo cambian con el catalogo), el cuerpo ya codificado y comprimido se guarda
+en un LRU del worker, asi que pedidos repetidos no vuelven a serializar ni a
+comprimir nada.
+
+``msgpack`` y ``brotli`` son opcionales: si no estan instalados se responde
+JSON y gzip.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from flask import Response, current_app, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _offered_mimetypes() -> list[str]:
+    return [JSON_MIMETYPE, *MSGPACK_MIMETYPES] if msgpack is not None else [JSON_MIMETYPE]
+
+
+def _offered_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_mimetype() -> str:
+    """Tipo de contenido preferido por el cliente (JSON por defecto)."""
+    return request.accept_mimetypes.best_match(_offered_mimetypes(), default=JSON_MIMETYPE)
+
+
+def choose_encoding() -> str | None:
+    """Codificacion preferida por el cliente o ``None`` para enviar sin comprimir."""
+    return request.accept_encodings.best_match(_offered_encodings())
+
+
+def encode_body(payload: Any, mimetype: str) -> bytes:
+    """Serializa ``payload``; acepta objetos Python, bytes JSON ya serializados o
+    un callable que los devuelva (se evalua solo si no hay cache)."""
+    if callable(payload):
+        payload = payload()
+    if mimetype == JSON_MIMETYPE:
+        if isinstance(payload, (bytes, bytearray)):
+            return bytes(payload)
+        # Mismos separadores compactos que jsonify fuera de modo debug
+        return current_app.json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    if isinstance(payload, (bytes, bytearray)):
+        payload = json.loads(payload)
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def compress_body(body: bytes, encoding: str | None) -> bytes:
+    """Comprime ``body`` con la codificacion indicada."""
+    if encoding == "br":
+        return brotli.compress(body, quality=current_app.config.get("BROTLI_QUALITY", 5))
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=current_app.config.get("GZIP_LEVEL", 6))
+    return body
+
+
+class ResponseCache:
+    """LRU acotado de cuerpos ya codificados y comprimidos."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[bytes, str | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bytes, str | None] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: tuple[bytes, str | None]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache: ResponseCache | None = None
+
+
+def _response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(current_app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+    return _cache
+
+
+def negotiated_response(payload: Any, status: int = 200, cache_key: Hashable | None = None) -> Response:
+    """Respuesta en el formato y la compresion que pide el cliente.
+
+    ``cache_key`` debe cambiar cuando cambian los datos (por ejemplo incluir la
+    generacion del snapshot del catalogo); solo se usa para respuestas
+    publicas, nunca para datos de un usuario.
+    """
+    mimetype = choose_mimetype()
+    accepted_encoding = choose_encoding()
+    full_key = (cache_key, mimetype, accepted_encoding)
+
+    entry = _response_cache().get(full_key) if cache_key is not None else None
+    if entry is None:
+        body = encode_body(payload, mimetype)
+        # Comprimir cuerpos chicos cuesta CPU y no ahorra bytes
+        encoding = accepted_encoding if len(body) >= current_app.config.get("COMPRESS_MIN_SIZE", 512) else None
+        entry = (compress_body(body, encoding), encoding)
+        if cache_key is not None:
+            _response_cache().set(full_key, entry)
+
+    body, encoding = entry
+    response = Response(body, status=status, mimetype=mimetype)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
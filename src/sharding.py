@@ -0,0 +1,341 @@
+"""Sharding opcional de ``watch_entries`` (y su historial) por ``user_id``.
+
+Con ``WATCH_ENTRY_SHARDS`` vacio todo sigue en la base principal y cada
+funcion devuelve ``db.session``. Al configurar shards (binds de
+``SQLALCHEMY_BINDS``):
+
+- ``users.shard`` indica donde viven las entradas de cada usuario. Un usuario
+  sin shard asignado conserva sus entradas en la base principal hasta su
+  primera escritura, cuando se mueve a ``default_shard(user_id)``.
+- Los ids de las entradas se reservan por bloques en ``id_blocks`` (base
+  principal), asi son unicos entre shards y se pueden mover sin renumerar.
+- El catalogo, ``users`` y demas tablas quedan en la base principal.
+
+Para probar localmente con varios SQLite::
+
+    WATCH_ENTRY_SHARD_URLS=sqlite:///instance/shard_0.db,sqlite:///instance/shard_1.db
+    flask shards-init
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Iterable, Iterator
+
+from flask import current_app, g
+from sqlalchemy import MetaData, delete, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database import db
+from src.models.id_block import IdBlock
+from src.models.user import User
+from src.models.watch_entry import WatchEntry
+from src.models.watch_entry_archive import WatchEntryArchive
+
+SHARDED_MODELS = (WatchEntry, WatchEntryArchive)
+ID_SEQUENCE = "watch_entries"
+DELETE_CHUNK_SIZE = 400
+
+
+def shard_keys() -> list[str]:
+    """Bind keys configurados como shards (vacio = sharding deshabilitado)."""
+    return list(current_app.config.get("WATCH_ENTRY_SHARDS") or [])
+
+
+def is_enabled() -> bool:
+    """Indica si hay shards configurados."""
+    return bool(shard_keys())
+
+
+def default_shard(user_id: int) -> str:
+    """Shard que corresponde a un usuario segun la configuracion actual."""
+    keys = shard_keys()
+    return keys[user_id % len(keys)]
+
+
+def session_for_shard(shard_key: str | None) -> Session:
+    """Sesion ligada al shard (``None`` = base principal) y cerrada al final del contexto."""
+    if shard_key is None:
+        return db.session
+    sessions = g.setdefault("_shard_sessions", {})
+    session = sessions.get(shard_key)
+    if session is None:
+        session = sessions[shard_key] = Session(bind=db.engines[shard_key])
+    return session
+
+
+def shard_for_user(user_id: int) -> str | None:
+    """Ubicacion actual de las entradas del usuario (``None`` = base principal)."""
+    if not is_enabled():
+        return None
+    # get_user_id() ya cargo al usuario: se resuelve desde el identity map
+    user = db.session.get(User, user_id)
+    return user.shard if user is not None else None
+
+
+def session_for_user(user_id: int) -> Session:
+    """Sesion para leer/escribir las entradas de un usuario."""
+    return session_for_shard(shard_for_user(user_id))
+
+
+def ensure_user_shard(user_id: int) -> Session:
+    """Antes de escribir: asigna (y migra) el shard de un usuario que todavia no tiene uno."""
+    if is_enabled() and shard_for_user(user_id) is None:
+        move_users([user_id], default_shard(user_id))
+    return session_for_user(user_id)
+
+
+def all_locations() -> list[str | None]:
+    """Todas las ubicaciones posibles de entradas: base principal y cada shard."""
+    return [None, *shard_keys()]
+
+
+def iter_sessions() -> Iterator[tuple[str | None, Session]]:
+    """Recorre cada ubicacion con su sesion (para jobs y exportaciones globales)."""
+    for shard_key in all_locations():
+        yield shard_key, session_for_shard(shard_key)
+
+
+def close_sessions(exception: BaseException | None = None) -> None:
+    """Cierra las sesiones de shards abiertas en el contexto actual."""
+    for session in g.pop("_shard_sessions", {}).values():
+        session.close()
+
+
+class IdAllocator:
+    """Reserva bloques de ids en ``id_blocks`` y los reparte desde memoria."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve(current_app.config.get("SHARD_ID_BLOCK_SIZE", 1000))
+            value = self._next
+            self._next += 1
+            return value
+
+    def _reserve(self, size: int) -> tuple[int, int]:
+        table = IdBlock.__table__
+        # Conexion propia: la reserva no depende de la transaccion del request
+        with db.engine.begin() as connection:
+            bump = update(table).where(table.c.name == ID_SEQUENCE).values(next_value=table.c.next_value + size)
+            if not connection.execute(bump).rowcount:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(insert(table).values(name=ID_SEQUENCE, next_value=_first_free_id() + size))
+                except IntegrityError:
+                    connection.execute(bump)
+            end = connection.scalar(select(table.c.next_value).where(table.c.name == ID_SEQUENCE))
+        return end - size, end
+
+
+def _first_free_id() -> int:
+    """Primer id libre considerando las entradas existentes en todas las ubicaciones."""
+    highest = 0
+    for shard_key in all_locations():
+        engine = db.engine if shard_key is None else db.engines[shard_key]
+        with engine.connect() as connection:
+            for model in SHARDED_MODELS:
+                value = connection.scalar(select(func.max(model.__table__.c.id)))
+                highest = max(highest, value or 0)
+    return highest + 1
+
+
+_allocator = IdAllocator()
+
+
+def next_entry_id() -> int | None:
+    """Id global para una entrada nueva; ``None`` (autoincrement) si no hay sharding."""
+    return _allocator.next_id() if is_enabled() else None
+
+
+def create_shard_tables() -> None:
+    """Crea ``watch_entries`` y su historial en cada shard, sin FKs hacia ``users``."""
+    metadata = MetaData()
+    for model in SHARDED_MODELS:
+        table = model.__table__.to_metadata(metadata)
+        # Las FKs apuntan a tablas de la base principal que no existen en el shard;
+        # create_all las resuelve desde table.foreign_keys, asi que se quitan de todos lados
+        for constraint in list(table.foreign_key_constraints):
+            table.constraints.discard(constraint)
+        for foreign_key in list(table.foreign_keys):
+            table.foreign_keys.discard(foreign_key)
+        for column in table.columns:
+            column.foreign_keys.clear()
+    for shard_key in shard_keys():
+        metadata.create_all(db.engines[shard_key])
+
+
+def _rows(session: Session, model, user_ids: list[int]) -> list[dict]:
+    table = model.__table__
+    return [dict(row) for row in session.execute(select(table).where(table.c.user_id.in_(user_ids))).mappings()]
+
+
+def _copy(source: Session, target: Session, user_ids: list[int]) -> dict:
+    """Copia las filas de los usuarios; devuelve los ids copiados por modelo."""
+    copied = {}
+    for model in SHARDED_MODELS:
+        rows = _rows(source, model, user_ids)
+        if rows:
+            target.execute(insert(model.__table__), rows)
+        copied[model] = {row["id"] for row in rows}
+    target.commit()
+    return copied
+
+
+def _catch_up(source: Session, target: Session, user_ids: list[int], known: dict) -> dict:
+    """Aplica en el destino lo escrito en el origen desde la pasada anterior.
+
+    ``known`` son los ids (por modelo) que ya se llevaron del origen al destino:
+    si faltan en el origen alli se borraron, y si faltan en el destino se borraron
+    despues del cambio de shard. Devuelve ``{modelo: {id: version}}`` de las filas
+    del origen ya reflejadas en el destino (o borradas alli a proposito).
+    """
+    # Transaccion de lectura nueva: en SQLite una abierta no ve lo que escriben otros
+    source.commit()
+    applied = {}
+    for model in SHARDED_MODELS:
+        table = model.__table__
+        source_rows = {row["id"]: row for row in _rows(source, model, user_ids)}
+        target_versions = {
+            entry_id: version
+            for entry_id, version in target.execute(
+                select(table.c.id, table.c.version).where(table.c.user_id.in_(user_ids))
+            )
+        }
+
+        for entry_id, row in source_rows.items():
+            if entry_id not in target_versions:
+                if entry_id not in known[model]:
+                    target.execute(insert(table), [row])
+            elif row["version"] > target_versions[entry_id]:
+                target.execute(update(table).where(table.c.id == entry_id).values(**row))
+
+        removed = known[model] - source_rows.keys()
+        if removed:
+            target.execute(delete(table).where(table.c.id.in_(removed)))
+        applied[model] = {entry_id: row["version"] for entry_id, row in source_rows.items()}
+    target.commit()
+    source.commit()
+    return applied
+
+
+def _delete_applied(source: Session, applied: dict) -> dict:
+    """Borra del origen solo las filas cuya ``(id, version)`` ya esta en el destino.
+
+    Devuelve los ids borrados por modelo; lo que un request en vuelo cambio o
+    inserto despues de la pasada sigue en el origen para la siguiente.
+    """
+    returning = source.get_bind().dialect.delete_returning
+    deleted = {}
+    for model, versions in applied.items():
+        table = model.__table__
+        pairs = list(versions.items())
+        deleted[model] = set()
+        if returning:
+            for start in range(0, len(pairs), DELETE_CHUNK_SIZE):
+                stmt = delete(table).where(
+                    tuple_(table.c.id, table.c.version).in_(pairs[start:start + DELETE_CHUNK_SIZE])
+                ).returning(table.c.id)
+                deleted[model].update(source.scalars(stmt))
+        else:
+            for entry_id, version in pairs:
+                stmt = delete(table).where(table.c.id == entry_id, table.c.version == version)
+                if source.execute(stmt).rowcount:
+                    deleted[model].add(entry_id)
+    source.commit()
+    return deleted
+
+
+def _remaining_users(source: Session, user_ids: list[int]) -> set[int]:
+    """Usuarios que todavia tienen filas en el origen."""
+    remaining = set()
+    for model in SHARDED_MODELS:
+        table = model.__table__
+        remaining.update(source.scalars(
+            select(table.c.user_id).where(table.c.user_id.in_(user_ids)).distinct()
+        ))
+    source.commit()
+    return remaining
+
+
+def move_users(user_ids: Iterable[int], target_key: str) -> int:
+    """Mueve las entradas de un lote de usuarios al shard ``target_key``.
+
+    Pasos: copiar al destino, cambiar ``users.shard`` (desde aca los requests
+    nuevos van al destino), reaplicar lo escrito en el origen mientras tanto y
+    borrar del origen solo lo reaplicado. Un request que resolvio el shard antes
+    del cambio todavia puede escribir en el origen, asi que esos dos ultimos pasos
+    se repiten hasta ``SHARD_CATCH_UP_ROUNDS`` veces; lo que quede se reporta en
+    el log y se conserva en el origen. Devuelve cuantos usuarios cambiaron de
+    ubicacion.
+    """
+    if target_key not in shard_keys():
+        raise ValueError(f"Shard desconocido: {target_key}")
+    rounds = max(current_app.config.get("SHARD_CATCH_UP_ROUNDS", 3), 1)
+
+    users = User.query.filter(User.id.in_(list(user_ids))).all()
+    by_source: dict[str | None, list[int]] = {}
+    for user in users:
+        if user.shard != target_key:
+            by_source.setdefault(user.shard, []).append(user.id)
+
+    target = session_for_shard(target_key)
+    for source_key, ids in by_source.items():
+        source = session_for_shard(source_key)
+        known = _copy(source, target, ids)
+
+        db.session.execute(update(User.__table__).where(User.__table__.c.id.in_(ids)).values(shard=target_key))
+        db.session.commit()
+
+        for _ in range(rounds):
+            applied = _catch_up(source, target, ids, known)
+            deleted = _delete_applied(source, applied)
+            # Lo reaplicado que no se pudo borrar cambio en el origen: queda para la proxima pasada
+            known = {model: applied[model].keys() - deleted[model] for model in SHARDED_MODELS}
+            remaining = _remaining_users(source, ids)
+            if not remaining and not any(known.values()):
+                break
+        else:
+            current_app.logger.warning(
+                "reshard %s -> %s: entradas escritas durante el movimiento siguen en el origen "
+                "(usuarios %s); se conservan ahi para revisarlas",
+                source_key, target_key, sorted(remaining),
+            )
+
+    return sum(len(ids) for ids in by_source.values())
+
+
+def rebalance(batch_size: int | None = None) -> int:
+    """Mueve por lotes a cada usuario cuya ubicacion no coincide con ``default_shard``."""
+    if batch_size is None:
+        batch_size = current_app.config.get("SHARD_MOVE_BATCH_SIZE", 500)
+
+    moved = 0
+    last_id = 0
+    while True:
+        users = db.session.execute(
+            select(User.id, User.shard).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not users:
+            break
+        last_id = users[-1].id
+
+        by_target: dict[str, list[int]] = {}
+        for user_id, shard in users:
+            target_key = default_shard(user_id)
+            if shard != target_key:
+                by_target.setdefault(target_key, []).append(user_id)
+        for target_key, ids in by_target.items():
+            moved += move_users(ids, target_key)
+    return moved
+
+
+def init_app(app) -> None:
+    """Cierra las sesiones de shards al terminar cada contexto de aplicacion."""
+    app.teardown_appcontext(close_sessions)
@@ -0,0 +1,202 @@
+"""Contadores de ventana deslizante para los rankings de tendencias.
+
+Cada worker acumula eventos en memoria en un ring buffer de buckets de tiempo
+y cada ``TRENDING_FLUSH_SECONDS`` suma sus deltas a ``trending_counts``. Con
+ese mismo flush se recalcula el top-N combinado de todos los workers, que es lo
+unico que leen los endpoints: nunca se recorre ``watch_entries``.
+"""
+
+from __future__ import annotations
+
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.database import db
+from src.models.movie import Movie
+from src.models.series import Series
+from src.models.trending_count import TrendingCount
+
+METRICS = ("added", "completed")
+
+
+class SlidingWindowCounter:
+    """Ring buffer de ``size`` buckets de ``bucket_seconds`` con conteos pendientes de flush."""
+
+    def __init__(self, bucket_seconds: int, size: int) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        self._bucket_ids: list[int | None] = [None] * size
+        self._buckets: list[dict[tuple[str, int], int]] = [{} for _ in range(size)]
+
+    def record(self, key: tuple[str, int], timestamp: float, amount: int = 1) -> None:
+        """Suma ``amount`` al bucket que contiene ``timestamp``."""
+        bucket_id = int(timestamp // self.bucket_seconds)
+        slot = bucket_id % self.size
+        if self._bucket_ids[slot] != bucket_id:
+            # El slot pertenecia a un bucket fuera de la ventana: se recicla
+            self._bucket_ids[slot] = bucket_id
+            self._buckets[slot] = {}
+        bucket = self._buckets[slot]
+        bucket[key] = bucket.get(key, 0) + amount
+
+    def drain(self) -> dict[tuple[datetime, tuple[str, int]], int]:
+        """Devuelve los deltas pendientes por ``(inicio_bucket, llave)`` y vacia el buffer."""
+        deltas = {}
+        for slot, bucket in enumerate(self._buckets):
+            if not bucket:
+                continue
+            bucket_start = datetime.utcfromtimestamp(self._bucket_ids[slot] * self.bucket_seconds)
+            for key, amount in bucket.items():
+                deltas[(bucket_start, key)] = amount
+            self._buckets[slot] = {}
+        return deltas
+
+    def restore(self, deltas: dict[tuple[datetime, tuple[str, int]], int]) -> None:
+        """Reincorpora deltas de un flush fallido para no perder eventos."""
+        for (bucket_start, key), amount in deltas.items():
+            self.record(key, calendar.timegm(bucket_start.utctimetuple()), amount)
+
+
+_lock = threading.Lock()
+_counters: dict[str, SlidingWindowCounter] = {}
+_top: dict[str, list[dict]] = {}
+_last_flush = 0.0
+
+
+def _counter(metric: str) -> SlidingWindowCounter:
+    counter = _counters.get(metric)
+    if counter is None:
+        config = current_app.config
+        bucket_seconds = config.get("TRENDING_BUCKET_MINUTES", 60) * 60
+        window_seconds = config.get("TRENDING_WINDOW_HOURS", 168) * 3600
+        counter = _counters[metric] = SlidingWindowCounter(
+            bucket_seconds, max(window_seconds // bucket_seconds, 1)
+        )
+    return counter
+
+
+def record(metric: str, content_type: str, content_id: int) -> None:
+    """Registra un evento (``added`` o ``completed``) para un titulo. Solo toca memoria."""
+    with _lock:
+        _counter(metric).record((content_type, content_id), time.time())
+
+
+def _apply_deltas(connection, metric: str, deltas) -> None:
+    table = TrendingCount.__table__
+    for (bucket_start, (content_type, content_id)), amount in deltas.items():
+        key = (
+            (table.c.metric == metric)
+            & (table.c.bucket_start == bucket_start)
+            & (table.c.content_type == content_type)
+            & (table.c.content_id == content_id)
+        )
+        increment = update(table).where(key).values(count=table.c.count + amount)
+        if connection.execute(increment).rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(
+                    metric=metric, bucket_start=bucket_start,
+                    content_type=content_type, content_id=content_id, count=amount,
+                ))
+        except IntegrityError:
+            # Otro worker inserto la misma fila entre el UPDATE y el INSERT
+            connection.execute(increment)
+
+
+def _compute_top(connection, metric: str, since: datetime, limit: int) -> list[dict]:
+    table = TrendingCount.__table__
+    total = func.sum(table.c.count).label("total")
+    rows = connection.execute(
+        select(table.c.content_type, table.c.content_id, total)
+        .where(table.c.metric == metric, table.c.bucket_start >= since)
+        .group_by(table.c.content_type, table.c.content_id)
+        .order_by(total.desc())
+        .limit(limit)
+    ).all()
+
+    titles = {}
+    for content_type, model in (("movie", Movie), ("series", Series)):
+        ids = [row.content_id for row in rows if row.content_type == content_type]
+        if ids:
+            for content_id, title in connection.execute(select(model.id, model.title).where(model.id.in_(ids))):
+                titles[(content_type, content_id)] = title
+
+    return [
+        {
+            "content_type": row.content_type,
+            "content_id": row.content_id,
+            "title": titles.get((row.content_type, row.content_id)),
+            "count": int(row.total),
+        }
+        for row in rows
+        if (row.content_type, row.content_id) in titles
+    ]
+
+
+def flush() -> None:
+    """Vuelca los deltas locales, poda buckets viejos y recalcula el top-N combinado."""
+    global _last_flush
+    config = current_app.config
+    window = timedelta(hours=config.get("TRENDING_WINDOW_HOURS", 168))
+    limit = config.get("TRENDING_TOP_N", 50)
+
+    with _lock:
+        pending = {metric: counter.drain() for metric, counter in _counters.items()}
+        _last_flush = time.monotonic()
+
+    since = datetime.utcnow() - window
+    # Conexion propia: no interfiere con la transaccion de la sesion del request
+    try:
+        with db.engine.begin() as connection:
+            for metric, deltas in pending.items():
+                _apply_deltas(connection, metric, deltas)
+            connection.execute(delete(TrendingCount.__table__).where(TrendingCount.bucket_start < since))
+            top = {metric: _compute_top(connection, metric, since, limit) for metric in METRICS}
+    except Exception:
+        with _lock:
+            for metric, deltas in pending.items():
+                _counters[metric].restore(deltas)
+        raise
+
+    with _lock:
+        _top.update(top)
+
+
+def maybe_flush() -> None:
+    """Hace flush si paso el intervalo configurado desde el ultimo."""
+    if time.monotonic() - _last_flush >= current_app.config.get("TRENDING_FLUSH_SECONDS", 30):
+        flush()
+
+
+def get_top(metric: str, limit: int | None = None) -> list[dict]:
+    """Top-N precalculado de ``metric``; se construye en el primer uso del worker.
+
+    Si ese primer flush falla se devuelve lo ultimo calculado (o ``[]``): las
+    tendencias nunca deben romper un request.
+    """
+    if metric not in _top:
+        try:
+            flush()
+        except Exception:  # noqa: BLE001
+            current_app.logger.exception("No se pudo calcular el top de tendencias")
+    top = _top.get(metric, [])
+    return top[:limit] if limit else top
+
+
+def init_app(app: Flask) -> None:
+    """Engancha el flush periodico al final de cada request."""
+
+    @app.after_request
+    def flush_trending(response):
+        try:
+            maybe_flush()
+        except Exception:  # noqa: BLE001 - las tendencias nunca deben romper un request
+            app.logger.exception("No se pudo hacer flush de los contadores de tendencias")
+        return response
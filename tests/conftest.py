@@ -0,0 +1,58 @@
+"""Fixtures compartidas: app con una base SQLite temporal y dos usuarios."""
+
+from __future__ import annotations
+
+import pytest
+
+from src import catalog_snapshot, create_app, negotiation, trending
+from src.config import TestingConfig
+from src.extensions import db
+from src.models import User
+
+ADMIN_TOKEN = "admin-secret"
+
+
+def auth(user_id: int) -> dict[str, str]:
+    """Headers de un request autenticado como ``user_id``."""
+    return {"X-User-Id": str(user_id)}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    class LocalConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        ADMIN_TOKEN = ADMIN_TOKEN
+
+    # Estado por worker (contadores, top, cache de respuestas): cada test arranca limpio
+    monkeypatch.setattr(trending, "_counters", {})
+    monkeypatch.setattr(trending, "_top", {})
+    monkeypatch.setattr(negotiation, "_cache", None)
+
+    app = create_app(LocalConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username="demo", email="demo@example.com"),
+            User(username="other", email="other@example.com"),
+        ])
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def snapshot(app, tmp_path, monkeypatch):
+    """Habilita el snapshot del catalogo (regeneracion en el mismo request) con estado limpio."""
+    app.config.update(
+        CATALOG_SNAPSHOT_ENABLED=True,
+        CATALOG_SNAPSHOT_PATH=str(tmp_path / "catalog.snap"),
+        CATALOG_SNAPSHOT_CHECK_SECONDS=0,
+        CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS=0,
+    )
+    for name, value in (("_current", None), ("_last_check", 0.0), ("_stale", False), ("_dirty", False), ("_timer", None)):
+        monkeypatch.setattr(catalog_snapshot, name, value)
+    return app
@@ -0,0 +1,90 @@
+"""Archivado de entradas completadas antiguas al historial."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, select, update
+
+from src.extensions import db
+from src.jobs.archive import archive_completed_entries
+from src.models import Movie, WatchEntry, WatchEntryArchive
+
+OLD = datetime.utcnow() - timedelta(days=90)
+
+
+@pytest.fixture
+def entries(app):
+    with app.app_context():
+        db.session.add_all([Movie(title=f"Movie {index}", duration=100) for index in range(4)])
+        db.session.flush()
+        db.session.add_all([
+            WatchEntry(user_id=1, content_type="movie", content_id=1, status="completed",
+                       current_progress=100, total_duration=100),
+            WatchEntry(user_id=1, content_type="movie", content_id=2, status="completed",
+                       current_progress=100, total_duration=100),
+            WatchEntry(user_id=1, content_type="movie", content_id=3, status="watching",
+                       current_progress=50, total_duration=100),
+            WatchEntry(user_id=2, content_type="movie", content_id=4, status="completed",
+                       current_progress=100, total_duration=100),
+        ])
+        db.session.commit()
+        # Las tres primeras quedan viejas; la cuarta se completo hoy
+        db.session.execute(update(WatchEntry).where(WatchEntry.id <= 3).values(updated_at=OLD))
+        db.session.commit()
+
+
+def active_and_archived(app):
+    with app.app_context():
+        return (
+            db.session.scalars(select(WatchEntry.id).order_by(WatchEntry.id)).all(),
+            db.session.scalars(select(WatchEntryArchive.id).order_by(WatchEntryArchive.id)).all(),
+        )
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "insert-select"])
+def delete_returning(request, app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "delete_returning", request.param)
+
+
+def test_archives_only_old_completed_entries(app, entries, delete_returning):
+    with app.app_context():
+        assert archive_completed_entries(batch_size=1) == 2
+
+    assert active_and_archived(app) == ([3, 4], [1, 2])
+    with app.app_context():
+        archived = db.session.get(WatchEntryArchive, 1)
+        assert (archived.status, archived.current_progress, archived.updated_at) == ("completed", 100, OLD)
+
+
+def test_entry_updated_after_the_batch_was_chosen_stays_active(app, entries, delete_returning):
+    with app.app_context():
+        url = db.engine.url
+        engine = db.engine
+    done = []
+
+    def concurrent_update(conn, cursor, statement, parameters, context, executemany):
+        # Otro request vuelve a abrir la entrada 1 entre el SELECT del lote y su DELETE
+        starts_batch = statement.lstrip().upper().startswith(
+            ("DELETE FROM WATCH_ENTRIES", "INSERT INTO WATCH_ENTRIES_HISTORY")
+        )
+        if starts_batch and not done:
+            done.append(statement)
+            other = create_engine(url)
+            with other.begin() as connection:
+                connection.execute(
+                    update(WatchEntry.__table__).where(WatchEntry.id == 1)
+                    .values(status="watching", current_progress=10, updated_at=datetime.utcnow())
+                )
+            other.dispose()
+
+    event.listen(engine, "before_cursor_execute", concurrent_update)
+    with app.app_context():
+        assert archive_completed_entries() == 1
+    event.remove(engine, "before_cursor_execute", concurrent_update)
+
+    assert active_and_archived(app) == ([1, 3, 4], [2])
+    with app.app_context():
+        assert db.session.get(WatchEntry, 1).current_progress == 10
@@ -0,0 +1,60 @@
+"""Snapshot del catalogo: regeneracion tras escrituras sin afectar al request."""
+
+from __future__ import annotations
+
+import json
+
+from src import catalog_snapshot
+
+
+def create_movie(client, title):
+    response = client.post("/movies", json={"title": title, "duration": 100})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def snapshot_titles(app):
+    with app.app_context():
+        current = catalog_snapshot.get_snapshot()
+        return None if current is None else [movie["title"] for movie in json.loads(current.movie_list())]
+
+
+def test_write_publishes_a_new_snapshot(snapshot, client):
+    create_movie(client, "Heat")
+
+    assert snapshot_titles(snapshot) == ["Heat"]
+    assert client.get("/movies").get_json()[0]["title"] == "Heat"
+
+
+def test_failed_rebuild_never_fails_the_write(snapshot, client, monkeypatch):
+    create_movie(client, "Heat")
+
+    def broken_serialize():
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(catalog_snapshot, "_serialize_catalog", broken_serialize)
+    movie_id = create_movie(client, "Alien")
+
+    # El worker que escribio lee de la BD hasta que un build publique su escritura
+    assert snapshot_titles(snapshot) is None
+    assert client.get(f"/movies/{movie_id}").get_json()["title"] == "Alien"
+    assert [movie["title"] for movie in client.get("/movies").get_json()] == ["Heat", "Alien"]
+
+
+def test_rebuild_is_debounced_off_the_request(snapshot, client, monkeypatch):
+    snapshot.config["CATALOG_SNAPSHOT_REFRESH_DELAY_SECONDS"] = 60
+    builds = []
+    monkeypatch.setattr(catalog_snapshot, "build_snapshot", lambda: builds.append(1))
+
+    create_movie(client, "Heat")
+    create_movie(client, "Alien")
+    timer = catalog_snapshot._timer
+
+    assert builds == []
+    assert [movie["title"] for movie in client.get("/movies").get_json()] == ["Heat", "Alien"]
+
+    # Una sola regeneracion para toda la rafaga
+    timer.cancel()
+    timer.function(*timer.args)
+    assert builds == [1]
+    assert catalog_snapshot._stale is False
@@ -0,0 +1,102 @@
+"""Exportacion en streaming de la watchlist (CSV / NDJSON)."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from conftest import ADMIN_TOKEN, auth
+from src.extensions import db
+from src.models import Movie, Series, WatchEntry
+
+
+@pytest.fixture
+def entries(app):
+    with app.app_context():
+        db.session.add_all([Movie(title="Heat", duration=170), Movie(title="Alien", duration=117)])
+        db.session.add(Series(title="Dark"))
+        db.session.add_all([
+            WatchEntry(user_id=1, content_type="movie", content_id=1, status="watching",
+                       current_progress=85, total_duration=170),
+            WatchEntry(user_id=1, content_type="series", content_id=1, status="pending",
+                       current_progress=0, total_duration=26),
+            WatchEntry(user_id=2, content_type="movie", content_id=2, status="completed",
+                       current_progress=117, total_duration=117),
+        ])
+        db.session.commit()
+        return {
+            entry.id: entry.to_dict()
+            for entry in db.session.scalars(db.select(WatchEntry).order_by(WatchEntry.id))
+        }
+
+
+def test_csv_rows_match_database(client, entries):
+    response = client.get("/watchlist/export?format=csv&include_titles=1", headers=auth(1))
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row["id"]) for row in rows] == [1, 2]
+    for row in rows:
+        expected = entries[int(row["id"])]
+        assert int(row["user_id"]) == 1
+        assert row["status"] == expected["status"]
+        assert int(row["current_progress"]) == expected["current_progress"]
+        assert float(row["percentage_watched"]) == expected["percentage_watched"]
+    assert [row["title"] for row in rows] == ["Heat", "Dark"]
+
+
+def test_admin_ndjson_exports_every_user(client, entries):
+    response = client.get("/admin/watchlist/export?format=ndjson", headers={"X-Admin-Token": ADMIN_TOKEN})
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {row["id"]: (row["user_id"], row["status"], row["current_progress"]) for row in rows} == {
+        entry_id: (entry["user_id"], entry["status"], entry["current_progress"])
+        for entry_id, entry in entries.items()
+    }
+
+
+def test_empty_csv_export_still_has_header(client):
+    response = client.get("/watchlist/export?format=csv", headers=auth(2))
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).splitlines() == [
+        "id,user_id,content_type,content_id,status,current_progress,total_duration,"
+        "percentage_watched,created_at,updated_at"
+    ]
+
+
+def test_gzip_export_decompresses_to_plain_export(client, entries):
+    plain = client.get("/watchlist/export?format=ndjson", headers=auth(1))
+    compressed = client.get("/watchlist/export?format=ndjson&compress=gzip", headers=auth(1))
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+@pytest.mark.parametrize("accept_encoding, encoded", [
+    ("gzip", True),
+    ("br, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("identity", False),
+])
+def test_gzip_follows_accept_encoding(client, entries, accept_encoding, encoded):
+    response = client.get(
+        "/watchlist/export?format=csv", headers={**auth(1), "Accept-Encoding": accept_encoding}
+    )
+
+    assert ("Content-Encoding" in response.headers) is encoded
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/watchlist/export?format=xml", headers=auth(1)).status_code == 400
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": ""}])
+def test_admin_export_requires_token(client, headers):
+    assert client.get("/admin/watchlist/export", headers=headers).status_code == 403
@@ -0,0 +1,89 @@
+"""Multi-get del catalogo (``?ids=``): orden, duplicados, faltantes y limite."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+from src import catalog_snapshot, trending
+from src.extensions import db
+from src.models import Movie, Season, Series
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        db.session.add_all([Movie(title=title, duration=100) for title in ("Heat", "Alien", "Up")])
+        for title in ("Dark", "Lost"):
+            series = Series(title=title)
+            series.seasons = [Season(season_number=number, episode_count=10) for number in (1, 2)]
+            db.session.add(series)
+        db.session.commit()
+
+
+@pytest.fixture(params=["db", "snapshot"])
+def source(request, app, catalog, monkeypatch):
+    """Corre cada test leyendo de la BD y del snapshot; devuelve la lista de SQL ejecutados."""
+    if request.param == "snapshot":
+        request.getfixturevalue("snapshot")
+        with app.app_context():
+            assert catalog_snapshot.get_snapshot() is not None
+    # Sin flush de tendencias al final del request: solo se cuentan las consultas de la vista
+    monkeypatch.setattr(trending, "_last_flush", time.monotonic())
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return request.param, statements
+
+
+def test_movies_come_back_in_request_order_with_duplicates_and_missing(client, source):
+    response = client.get("/movies?ids=3,1,99,3")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [movie and movie["title"] for movie in body["items"]] == ["Up", "Heat", None, "Up"]
+    assert body["missing"] == [99]
+
+
+def test_series_include_seasons(client, source):
+    body = client.get("/series?ids=2,7,1").get_json()
+
+    assert [series and series["title"] for series in body["items"]] == ["Lost", None, "Dark"]
+    assert [season["season_number"] for season in body["items"][0]["seasons"]] == [1, 2]
+    assert body["missing"] == [7]
+
+
+def test_only_missing_ids(client, source):
+    assert client.get("/movies?ids=50,51").get_json() == {"items": [None, None], "missing": [50, 51]}
+
+
+def test_query_count_does_not_grow_with_ids(client, source):
+    kind, statements = source
+    client.get("/movies?ids=1,2,3")
+    movie_queries = len(statements)
+    statements.clear()
+    client.get("/series?ids=1,2")
+
+    if kind == "snapshot":
+        # Se arma el cuerpo con los bytes del snapshot, sin tocar la BD
+        assert (movie_queries, len(statements)) == (0, 0)
+    else:
+        # Un IN para peliculas; series mas temporadas con selectinload
+        assert (movie_queries, len(statements)) == (1, 2)
+
+
+@pytest.mark.parametrize("ids", ["1,2,3", "1,1,1", "a,b", ""])
+def test_invalid_or_too_many_ids_are_rejected(app, client, catalog, ids):
+    app.config["MULTI_GET_MAX_IDS"] = 2
+
+    assert client.get(f"/movies?ids={ids}").status_code == 400
+    assert client.get(f"/series?ids={ids}").status_code == 400
+
+
+def test_limit_is_inclusive(app, client, catalog):
+    app.config["MULTI_GET_MAX_IDS"] = 2
+
+    assert client.get("/movies?ids=1,2").status_code == 200
@@ -0,0 +1,116 @@
+"""Actualizacion de progreso: control de version (If-Match), modo monotono e historial."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from conftest import auth
+from src.extensions import db
+from src.jobs.archive import archive_completed_entries
+from src.models import Movie, WatchEntry, WatchEntryArchive
+
+
+@pytest.fixture
+def entry_id(app, client):
+    with app.app_context():
+        db.session.add(Movie(title="Heat", duration=100))
+        db.session.commit()
+    response = client.post("/watchlist", json={"content_type": "movie", "content_id": 1}, headers=auth(1))
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def put_progress(client, entry_id, body, headers=None, query=""):
+    return client.put(
+        f"/watchlist/{entry_id}/progress{query}", json=body, headers={**auth(1), **(headers or {})}
+    )
+
+
+def test_matching_if_match_updates_and_returns_new_etag(client, entry_id):
+    response = put_progress(client, entry_id, {"current_progress": 40}, {"If-Match": '"1"'})
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+
+
+@pytest.mark.parametrize("body, headers", [
+    ({"current_progress": 40}, {"If-Match": '"5"'}),
+    ({"current_progress": 40, "version": 5}, {}),
+    # Sin progreso no hay nada que escribir, pero la version vieja igual es un conflicto
+    ({"status": "watching"}, {"If-Match": 'W/"5"'}),
+    ({"version": 5}, {}),
+])
+def test_stale_version_is_a_conflict(client, entry_id, body, headers):
+    response = put_progress(client, entry_id, body, headers)
+
+    assert response.status_code == 412
+    assert response.get_json()["current"]["version"] == 1
+    assert response.headers["ETag"] == '"1"'
+
+
+def test_current_version_without_progress_returns_the_entry(client, entry_id):
+    response = put_progress(client, entry_id, {"version": 1})
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 1
+
+
+def test_if_match_star_skips_the_version_check(client, entry_id):
+    put_progress(client, entry_id, {"current_progress": 10})
+
+    response = put_progress(client, entry_id, {"current_progress": 40}, {"If-Match": "*"})
+    assert response.status_code == 200
+    assert response.get_json()["current_progress"] == 40
+
+
+@pytest.mark.parametrize("body, headers", [
+    ({"current_progress": 40}, {"If-Match": '"abc"'}),
+    ({"current_progress": 40, "version": "abc"}, {}),
+    ({"current_progress": 40, "version": 1.5}, {}),
+    ({"current_progress": 40, "version": True}, {}),
+])
+def test_invalid_version_is_rejected(client, entry_id, body, headers):
+    assert put_progress(client, entry_id, body, headers).status_code == 400
+
+
+def test_monotonic_ignores_progress_going_back(client, entry_id):
+    put_progress(client, entry_id, {"current_progress": 60})
+
+    ignored = put_progress(client, entry_id, {"current_progress": 30}, query="?monotonic=1")
+    assert ignored.status_code == 200
+    assert (ignored.get_json()["current_progress"], ignored.get_json()["version"]) == (60, 2)
+
+    applied = put_progress(client, entry_id, {"current_progress": 30})
+    assert (applied.get_json()["current_progress"], applied.get_json()["version"]) == (30, 3)
+
+
+def test_same_progress_does_not_bump_the_version(client, entry_id):
+    first = put_progress(client, entry_id, {"current_progress": 60})
+    again = put_progress(client, entry_id, {"current_progress": 60}, {"If-Match": '"2"'})
+
+    assert first.get_json()["version"] == again.get_json()["version"] == 2
+
+
+def test_progress_on_archived_entry_restores_it(app, client, entry_id):
+    put_progress(client, entry_id, {"current_progress": 100})
+    old = datetime.utcnow() - timedelta(days=90)
+    with app.app_context():
+        db.session.execute(update(WatchEntry).where(WatchEntry.id == entry_id).values(updated_at=old))
+        db.session.commit()
+        assert archive_completed_entries() == 1
+
+    stale = put_progress(client, entry_id, {"current_progress": 50}, {"If-Match": '"1"'})
+    assert stale.status_code == 412
+
+    response = put_progress(client, entry_id, {"current_progress": 50}, {"If-Match": '"2"'})
+    assert response.status_code == 200
+    assert (response.get_json()["status"], response.get_json()["version"]) == ("watching", 3)
+    with app.app_context():
+        assert db.session.scalars(select(WatchEntryArchive.id)).all() == []
+        restored = db.session.get(WatchEntry, entry_id)
+        assert restored.current_progress == 50
+        assert restored.updated_at > old
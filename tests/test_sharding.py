@@ -0,0 +1,129 @@
+"""Sharding de watch_entries con dos bases SQLite locales."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import inspect, select, update
+
+from src import create_app, sharding
+from src.config import TestingConfig
+from src.extensions import db
+from src.models import Movie, User, WatchEntry
+
+USER_HEADERS = {"X-User-Id": "1"}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    binds = {f"watch_shard_{index}": f"sqlite:///{tmp_path / f'shard_{index}.db'}" for index in range(2)}
+
+    class ShardedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SQLALCHEMY_BINDS = binds
+        WATCH_ENTRY_SHARDS = list(binds)
+
+    # Los bloques de ids reservados son por proceso: cada test arranca con bases nuevas
+    monkeypatch.setattr(sharding, "_allocator", sharding.IdAllocator())
+    # init_app registra un MetaData por bind en el ``db`` global; sin esto create_all de
+    # los tests siguientes buscaria los shards en apps que no los tienen
+    monkeypatch.setattr(db, "metadatas", dict(db.metadatas))
+    app = create_app(ShardedConfig)
+    with app.app_context():
+        db.create_all()
+        result = app.test_cli_runner().invoke(args=["shards-init"])
+        assert result.exit_code == 0, result.output
+
+        db.session.add(User(username="demo", email="demo@example.com"))
+        db.session.add_all([Movie(title=f"Movie {index}", duration=100) for index in range(3)])
+        # Entrada previa al sharding: vive en la base principal hasta la primera escritura
+        db.session.add(WatchEntry(
+            user_id=1, content_type="movie", content_id=1,
+            status="watching", current_progress=40, total_duration=100,
+        ))
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def entry_ids(app, shard_key):
+    with app.app_context():
+        session = sharding.session_for_shard(shard_key)
+        return sorted(session.scalars(select(WatchEntry.id).where(WatchEntry.user_id == 1)))
+
+
+def user_shard(app):
+    with app.app_context():
+        return db.session.get(User, 1).shard
+
+
+def test_shards_init_creates_tables_without_foreign_keys(app):
+    with app.app_context():
+        for shard_key in sharding.shard_keys():
+            inspector = inspect(db.engines[shard_key])
+            assert {"watch_entries", "watch_entries_history"} <= set(inspector.get_table_names())
+            assert inspector.get_foreign_keys("watch_entries") == []
+
+
+def test_first_write_moves_user_to_default_shard(app, client):
+    response = client.post("/watchlist", json={"content_type": "movie", "content_id": 2}, headers=USER_HEADERS)
+    assert response.status_code == 201
+
+    assert user_shard(app) == "watch_shard_1"
+    assert entry_ids(app, None) == []
+    assert len(entry_ids(app, "watch_shard_1")) == 2
+
+    watchlist = client.get("/watchlist", headers=USER_HEADERS).get_json()
+    assert sorted((entry["content_id"], entry["current_progress"]) for entry in watchlist) == [(1, 40), (2, 0)]
+
+
+def test_reshard_moves_entries_and_reads_them_back(app, client):
+    client.post("/watchlist", json={"content_type": "movie", "content_id": 2}, headers=USER_HEADERS)
+    before = client.get("/watchlist", headers=USER_HEADERS).get_json()
+
+    result = app.test_cli_runner().invoke(args=["reshard", "--user-ids", "1", "--to", "watch_shard_0"])
+    assert result.exit_code == 0, result.output
+    assert "1 usuarios movidos" in result.output
+
+    assert user_shard(app) == "watch_shard_0"
+    assert entry_ids(app, "watch_shard_1") == []
+    assert client.get("/watchlist", headers=USER_HEADERS).get_json() == before
+
+    entry_id = before[0]["id"]
+    response = client.put(f"/watchlist/{entry_id}/progress", json={"current_progress": 100}, headers=USER_HEADERS)
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "completed"
+
+
+def test_move_keeps_writes_made_while_moving(app, monkeypatch):
+    original_delete = sharding._delete_applied
+    calls = []
+
+    def delete_with_in_flight_write(source, applied):
+        # Un request que resolvio el shard antes del cambio escribe en el origen
+        if not calls:
+            new_id = sharding.next_entry_id()
+            source.execute(update(WatchEntry).where(WatchEntry.content_id == 1).values(
+                current_progress=80, version=WatchEntry.version + 1,
+            ))
+            source.add(WatchEntry(
+                id=new_id, user_id=1, content_type="movie", content_id=3,
+                status="pending", current_progress=0, total_duration=100,
+            ))
+            source.commit()
+        calls.append(applied)
+        return original_delete(source, applied)
+
+    monkeypatch.setattr(sharding, "_delete_applied", delete_with_in_flight_write)
+    with app.app_context():
+        assert sharding.move_users([1], "watch_shard_0") == 1
+
+    assert len(calls) == 2
+    assert entry_ids(app, None) == []
+    with app.app_context():
+        session = sharding.session_for_shard("watch_shard_0")
+        progress = dict(session.execute(select(WatchEntry.content_id, WatchEntry.current_progress)).all())
+    assert progress == {1: 80, 3: 0}
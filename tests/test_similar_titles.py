@@ -0,0 +1,94 @@
+"""Refresco incremental de la tabla de titulos similares."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+
+from conftest import auth
+from src.extensions import db
+from src.jobs import similar_titles
+from src.jobs.similar_titles import build_similar_titles
+from src.models import Movie
+from src.models.similar_title import SimilarTitle
+from src.models.similar_title_change import SimilarTitleChange
+
+
+@pytest.fixture
+def movies(app):
+    with app.app_context():
+        # Generos distintos: los vecinos salen solo de la co-ocurrencia
+        db.session.add_all([
+            Movie(title="Heat", duration=170, genre="Crimen"),
+            Movie(title="Alien", duration=117, genre="Terror"),
+            Movie(title="Up", duration=96, genre="Animacion"),
+        ])
+        db.session.commit()
+
+
+def add(client, user_id, movie_id):
+    response = client.post("/watchlist", json={"content_type": "movie", "content_id": movie_id}, headers=auth(user_id))
+    assert response.status_code == 201
+
+
+def neighbor_ids(app, movie_id):
+    with app.app_context():
+        return {neighbor["content_id"] for neighbor in SimilarTitle.get_neighbors("movie", movie_id)}
+
+
+def pending_changes(app):
+    with app.app_context():
+        return db.session.scalars(select(SimilarTitleChange.id)).all()
+
+
+def test_incremental_build_picks_up_changes_made_right_after_a_build(app, client, movies):
+    add(client, 1, 1)
+    add(client, 1, 2)
+    with app.app_context():
+        assert build_similar_titles(full=True) == 3
+    assert neighbor_ids(app, 1) == {2}
+    assert pending_changes(app) == []
+
+    # En el mismo segundo que el build anterior: no hay marca de tiempo que los deje afuera
+    add(client, 1, 3)
+    with app.app_context():
+        assert build_similar_titles() == 3
+    assert neighbor_ids(app, 1) == {2, 3}
+    assert pending_changes(app) == []
+
+
+def test_incremental_build_sees_deletes(app, client, movies):
+    add(client, 1, 1)
+    add(client, 1, 2)
+    with app.app_context():
+        build_similar_titles(full=True)
+
+    entry_id = client.get("/watchlist", headers=auth(1)).get_json()[1]["id"]
+    assert client.delete(f"/watchlist/{entry_id}", headers=auth(1)).status_code == 204
+    with app.app_context():
+        build_similar_titles()
+    assert neighbor_ids(app, 1) == set()
+
+
+def test_changes_marked_during_a_build_are_kept_for_the_next_one(app, client, movies, monkeypatch):
+    add(client, 1, 1)
+    with app.app_context():
+        build_similar_titles(full=True)
+
+    original_load_catalog = similar_titles.load_catalog
+
+    def load_catalog_with_concurrent_write():
+        # Un request escribe despues de que el build leyo las marcas pendientes
+        add(client, 1, 2)
+        return original_load_catalog()
+
+    monkeypatch.setattr(similar_titles, "load_catalog", load_catalog_with_concurrent_write)
+    with app.app_context():
+        build_similar_titles()
+    assert len(pending_changes(app)) == 1
+
+    monkeypatch.setattr(similar_titles, "load_catalog", original_load_catalog)
+    with app.app_context():
+        build_similar_titles()
+    assert neighbor_ids(app, 1) == {2}
+    assert pending_changes(app) == []
@@ -0,0 +1,90 @@
+"""Contadores de tendencias: ring buffer por worker y agregado en ``trending_counts``."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from src import trending
+from src.extensions import db
+from src.models import Movie
+from src.models.trending_count import TrendingCount
+from src.trending import SlidingWindowCounter
+
+
+@pytest.fixture
+def movies(app):
+    with app.app_context():
+        db.session.add_all([Movie(title="Heat", duration=170), Movie(title="Alien", duration=117)])
+        db.session.commit()
+
+
+def test_counter_recycles_buckets_that_left_the_window():
+    counter = SlidingWindowCounter(bucket_seconds=10, size=3)
+    counter.record(("movie", 1), 5)
+    counter.record(("movie", 1), 15)
+    counter.record(("movie", 2), 17)
+    # Bucket 3 cae en el slot del bucket 0, que ya salio de la ventana
+    counter.record(("movie", 1), 35)
+
+    assert counter.drain() == {
+        (datetime(1970, 1, 1, 0, 0, 10), ("movie", 1)): 1,
+        (datetime(1970, 1, 1, 0, 0, 10), ("movie", 2)): 1,
+        (datetime(1970, 1, 1, 0, 0, 30), ("movie", 1)): 1,
+    }
+
+
+def test_drain_empties_the_buffer_and_restore_puts_deltas_back():
+    counter = SlidingWindowCounter(bucket_seconds=60, size=4)
+    counter.record(("movie", 1), 100)
+    counter.record(("movie", 1), 110)
+    counter.record(("series", 1), 200)
+
+    deltas = counter.drain()
+    assert counter.drain() == {}
+
+    counter.restore(deltas)
+    counter.record(("movie", 1), 119)
+    assert counter.drain() == {**deltas, (datetime(1970, 1, 1, 0, 1), ("movie", 1)): 3}
+
+
+def test_flush_merges_counts_from_several_workers(app, movies, monkeypatch):
+    with app.app_context():
+        trending.record("added", "movie", 1)
+        trending.record("added", "movie", 1)
+        trending.flush()
+
+        # Otro worker: sus propios contadores en memoria, la misma tabla
+        monkeypatch.setattr(trending, "_counters", {})
+        trending.record("added", "movie", 1)
+        trending.record("added", "movie", 2)
+        trending.flush()
+
+        assert [(row["content_id"], row["count"]) for row in trending.get_top("added")] == [(1, 3), (2, 1)]
+        counts = db.session.execute(
+            select(TrendingCount.content_id, TrendingCount.count).order_by(TrendingCount.content_id)
+        ).all()
+        assert [tuple(row) for row in counts] == [(1, 3), (2, 1)]
+
+
+def test_get_top_survives_a_failed_flush(app, client, movies, monkeypatch):
+    compute_top = trending._compute_top
+
+    def broken_compute_top(*args, **kwargs):
+        raise RuntimeError("base caida")
+
+    with app.app_context():
+        trending.record("added", "movie", 1)
+    monkeypatch.setattr(trending, "_compute_top", broken_compute_top)
+
+    response = client.get("/trending")
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+    # Los deltas del flush fallido se conservan para el siguiente
+    monkeypatch.setattr(trending, "_compute_top", compute_top)
+    monkeypatch.setattr(trending, "_top", {})
+    with app.app_context():
+        assert [(row["content_id"], row["count"]) for row in trending.get_top("added")] == [(1, 1)]